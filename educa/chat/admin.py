@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from chat.models import Message
+from chat.models import ArchivedMessage, ChatRetention, Message
 
 
 @admin.register(Message)
@@ -8,4 +8,17 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ['sent_on', 'user', 'course', 'content']
     list_filter = ['sent_on', 'course']
     search_fields = ['content']
-    raw_id_fields = ['user', 'course']
\ No newline at end of file
+    raw_id_fields = ['user', 'course']
+
+
+@admin.register(ArchivedMessage)
+class ArchivedMessageAdmin(admin.ModelAdmin):
+    list_display = ['sent_on', 'user', 'course', 'content']
+    list_filter = ['course']
+    raw_id_fields = ['user', 'course']
+
+
+@admin.register(ChatRetention)
+class ChatRetentionAdmin(admin.ModelAdmin):
+    list_display = ['course', 'hot_days', 'archive_days']
+    raw_id_fields = ['course']
@@ -0,0 +1,311 @@
+"""
+Буфер пакетной записи сообщений чата.
+
+Все ChatConsumer процесса кладут сообщения в общую очередь, а одна
+фоновая задача пишет их в БД через bulk_create - пачкой из MAX_BATCH
+сообщений или не реже чем раз в MAX_DELAY_MS. Очередь ограничена
+MAX_PENDING: если БД не успевает, receive() ждёт свободного места.
+
+При SPILL_TO_REDIS каждое сообщение до постановки в очередь пишется в
+Redis stream процесса и удаляется оттуда после записи в БД. Если процесс
+упал, его stream остаётся без heartbeat-ключа, и следующий запущенный
+процесс дописывает такие сообщения в БД.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime
+
+import redis
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from chat.models import Message
+from utils.redis_utils import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+SPILL_PREFIX = 'educa:chat:spill'
+HEARTBEAT_TTL = 30
+RECOVERY_INTERVAL = 60
+# Попыток записи чужого stream за один проход; при неудаче stream возвращается
+RECOVERY_ATTEMPTS = 3
+# Сколько close() ждёт начатой записи и сколько раз пробует дописать остаток
+CLOSE_TIMEOUT = 10
+CLOSE_ATTEMPTS = 5
+
+
+def alive_key(stream):
+    """Heartbeat-ключ процесса-владельца stream (и его :recovering)."""
+    owner = stream[len(SPILL_PREFIX) + 1:].split(':')[0]
+    return f"{SPILL_PREFIX}:{owner}:alive"
+
+
+class MessageWriteBuffer:
+    def __init__(self, max_batch=100, max_delay_ms=250, max_pending=5000,
+                 spill_to_redis=True):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.spill_to_redis = spill_to_redis
+        self.token = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.stream = f"{SPILL_PREFIX}:{self.token}"
+        self._queue = None
+        self._tasks = []
+        self._in_flight = []
+        self._writing = None
+        self._flushed_callbacks = []
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'CHAT_WRITE_BUFFER', {})
+        return cls(
+            max_batch=options.get('MAX_BATCH', 100),
+            max_delay_ms=options.get('MAX_DELAY_MS', 250),
+            max_pending=options.get('MAX_PENDING', 5000),
+            spill_to_redis=options.get('SPILL_TO_REDIS', True),
+        )
+
+    @property
+    def alive_key(self):
+        return alive_key(self.stream)
+
+    def on_flushed(self, callback):
+        """
+        Зарегистрировать async-колбэк для записанной пачки.
+
+        Колбэк получает словари сообщений с уже присвоенным ``id``.
+        """
+        self._flushed_callbacks.append(callback)
+
+    def _ensure_started(self):
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._run())]
+        if self.spill_to_redis:
+            # Heartbeat - отдельной задачей: долгое восстановление при
+            # недоступной БД не должно гасить alive-ключ живого процесса
+            self._tasks.append(asyncio.create_task(self._heartbeat()))
+            self._tasks.append(asyncio.create_task(self._recover_loop()))
+
+    async def add(self, user_id, username, course_id, content, sent_on):
+        """Поставить сообщение в очередь; ждёт, если очередь заполнена."""
+        self._ensure_started()
+        entry = {
+            'id': None,
+            'user_id': user_id,
+            'username': username,
+            'course_id': course_id,
+            'content': content,
+            'sent_on': sent_on,
+            'stream_id': None,
+        }
+        if self.spill_to_redis:
+            try:
+                entry['stream_id'] = await get_async_redis().xadd(self.stream, {
+                    'user_id': user_id,
+                    'username': username,
+                    'course_id': course_id,
+                    'content': content,
+                    'sent_on': sent_on.isoformat(),
+                })
+            except Exception as e:
+                logger.error(f"Chat spill error: {e}")
+        await self._queue.put(entry)
+
+    async def _next_batch(self):
+        # Пачка собирается сразу в _in_flight: если close() отменит сбор,
+        # уже вынутые из очереди сообщения не потеряются
+        loop = asyncio.get_running_loop()
+        batch = self._in_flight = []
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            self._writing = asyncio.ensure_future(self._write_with_retry(batch))
+            # shield: отмена _run в close() не прерывает bulk_create в потоке,
+            # close() сам дождётся этой записи
+            await asyncio.shield(self._writing)
+            self._writing = None
+            self._in_flight = []
+
+    async def _write_with_retry(self, batch, attempts=None):
+        delay = 0.5
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await self._write(batch)
+                return
+            except Exception as e:
+                # БД недоступна: очередь заполнится и включится backpressure
+                logger.error(f"Chat batch write failed ({len(batch)} messages): {e}")
+                if attempts is not None and attempt >= attempts:
+                    raise
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+
+    async def _write(self, batch):
+        await database_sync_to_async(self._bulk_create)(batch)
+        stream_ids = [entry['stream_id'] for entry in batch if entry['stream_id']]
+        if stream_ids:
+            try:
+                await get_async_redis().xdel(self.stream, *stream_ids)
+            except Exception as e:
+                logger.error(f"Chat spill cleanup error: {e}")
+        for callback in self._flushed_callbacks:
+            try:
+                await callback(batch)
+            except Exception as e:
+                logger.error(f"Chat flush callback error: {e}")
+
+    @staticmethod
+    def _bulk_create(batch):
+        messages = Message.objects.bulk_create([
+            Message(
+                user_id=entry['user_id'],
+                course_id=entry['course_id'],
+                content=entry['content'],
+                sent_on=entry['sent_on'],
+            )
+            for entry in batch
+        ])
+        for entry, message in zip(batch, messages):
+            entry['id'] = message.pk
+
+    async def _heartbeat(self):
+        """Продлевать heartbeat-ключ своего stream."""
+        redis = get_async_redis()
+        while True:
+            try:
+                await redis.set(self.alive_key, 1, ex=HEARTBEAT_TTL)
+            except Exception as e:
+                logger.error(f"Chat spill heartbeat error: {e}")
+            await asyncio.sleep(HEARTBEAT_TTL / 3)
+
+    async def _recover_loop(self):
+        """Периодически восстанавливать stream-ы упавших процессов."""
+        while True:
+            await self._recover_orphans()
+            await asyncio.sleep(RECOVERY_INTERVAL)
+
+    async def _recover_orphans(self):
+        """Дописать сообщения из stream-ов упавших процессов."""
+        redis = get_async_redis()
+        try:
+            async for stream in redis.scan_iter(match=f"{SPILL_PREFIX}:*", _type='stream'):
+                if stream.startswith(self.stream) or await redis.exists(alive_key(stream)):
+                    continue
+                claimed = f"{self.stream}:recovering"
+                try:
+                    # RENAME атомарен: stream заберёт только один процесс
+                    await redis.rename(stream, claimed)
+                except Exception:
+                    continue
+                entries = await redis.xrange(claimed)
+                batch = [
+                    {
+                        'id': None,
+                        'user_id': int(fields['user_id']),
+                        'username': fields.get('username', ''),
+                        'course_id': int(fields['course_id']),
+                        'content': fields['content'],
+                        'sent_on': datetime.fromisoformat(fields['sent_on']),
+                        'stream_id': None,
+                    }
+                    for _, fields in entries
+                ]
+                if batch:
+                    try:
+                        await self._write_with_retry(batch, attempts=RECOVERY_ATTEMPTS)
+                    except Exception:
+                        # Вернуть stream под старое имя: его заберёт следующий проход
+                        await redis.rename(claimed, stream)
+                        logger.error(f"Chat spill recovery of {stream} postponed")
+                        continue
+                await redis.delete(claimed)
+                logger.info(f"Recovered {len(batch)} chat messages from {stream}")
+        except Exception as e:
+            logger.error(f"Chat spill recovery error: {e}")
+
+    def _remaining(self):
+        remaining = list(self._in_flight)
+        if self._queue is not None:
+            while not self._queue.empty():
+                remaining.append(self._queue.get_nowait())
+        self._in_flight = []
+        return remaining
+
+    async def close(self):
+        """Записать всё, что осталось в очереди (остановка сервера)."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        writing, self._writing = self._writing, None
+        if writing is not None:
+            done, _ = await asyncio.wait({writing}, timeout=CLOSE_TIMEOUT)
+            if not done:
+                # bulk_create мог уже выполниться в потоке - повторно не пишем,
+                # сообщения остаются в spill stream для восстановления
+                writing.cancel()
+                logger.error(f"Chat batch write did not finish in {CLOSE_TIMEOUT}s on close")
+            # Пачка записана (или оставлена spill stream) - в остаток не входит
+            self._in_flight = []
+
+        remaining = self._remaining()
+        if remaining:
+            try:
+                await self._write_with_retry(remaining, attempts=CLOSE_ATTEMPTS)
+            except Exception:
+                logger.error(f"Chat flush on close failed, {len(remaining)} messages left in spill")
+        self._queue = None
+        if self.spill_to_redis:
+            try:
+                await get_async_redis().delete(self.alive_key)
+            except Exception as e:
+                logger.error(f"Chat spill heartbeat cleanup error: {e}")
+
+    def close_sync(self):
+        """Последняя попытка записи при выходе процесса (atexit)."""
+        remaining = self._remaining()
+        if not remaining:
+            return
+        try:
+            self._bulk_create(remaining)
+            logger.info(f"Flushed {len(remaining)} chat messages at exit")
+        except Exception as e:
+            # Сообщения остаются в spill stream и будут восстановлены
+            logger.error(f"Chat flush at exit failed: {e}")
+            return
+        stream_ids = [entry['stream_id'] for entry in remaining if entry['stream_id']]
+        if stream_ids:
+            try:
+                redis.Redis.from_url(settings.REDIS_URL).xdel(self.stream, *stream_ids)
+            except Exception as e:
+                logger.error(f"Chat spill cleanup error: {e}")
+
+
+message_buffer = MessageWriteBuffer.from_settings()
+atexit.register(message_buffer.close_sync)
@@ -1,13 +1,33 @@
 import json
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from django.utils import timezone
-from chat.models import Message
+from chat import history
+from chat.buffer import message_buffer
+from chat.fanout import chat_layer_alias, encode_message, frame_coalescer
+from chat.outbound import OutboundQueue
+from courses.membership import CourseMembership
+
+# Записанные в БД сообщения попадают в недавнюю историю курса в Redis
+message_buffer.on_flushed(history.apush)
+
 
 class ChatConsumer(AsyncJsonWebsocketConsumer):
+    # 'fanout' - pub/sub слой для комнат с тысячами участников
+    channel_layer_alias = chat_layer_alias()
+
     async def connect(self):
         self.user = self.scope['user']
         self.id = self.scope['url_route']['kwargs']['course_id']
         self.room_group_name = f'chat_{self.id}'
+        # Только записанные на курс студенты (одна команда Redis, без SQL)
+        if not self.user.is_authenticated or not await CourseMembership.ais_member(
+            int(self.id), self.user.id
+        ):
+            await self.close()
+            return
+        # Кадры группы отправляются клиенту через ограниченную очередь
+        self.outbound = OutboundQueue.from_settings(self.send, self.close)
         # Присоединится к группе чат комнаты
         await self.channel_layer.group_add(
             self.room_group_name, self.channel_name
@@ -16,35 +36,58 @@ class ChatConsumer(AsyncJsonWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        if getattr(self, 'outbound', None):
+            self.outbound.stop()
         # покинуть группу чат комнаты
         await self.channel_layer.group_discard(
             self.room_group_name, self.channel_name
         )
-    async def persist_message(self, message):
-        # Отправить сообщение в вебсокет
-        await Message.objects.acreate(
-            user=self.user, course_id=self.id, content=message
+    async def persist_message(self, message, sent_on):
+        # Поставить сообщение в общий буфер пакетной записи
+        await message_buffer.add(
+            self.user.id, self.user.username, int(self.id), message, sent_on
         )
 
     # получить сообщение из WebSocket
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
+        if text_data_json.get('type') == 'history':
+            await self.send_history()
+            return
+        if text_data_json.get('type') == 'load_older':
+            await self.send_older(
+                text_data_json.get('before'), text_data_json.get('limit')
+            )
+            return
         message = text_data_json['message']
         now = timezone.now()
-        # Отправка сообщения в чат группу
-        await self.channel_layer.group_send(
+        # Отправка сообщения в чат группу: кадр кодируется один раз
+        await frame_coalescer.publish(
+            self.channel_layer,
             self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message,
-                'user': self.user.username,
-                'datetime': now.isoformat(),
-            },
+            encode_message(self.user.username, message, now),
         )
         # Сохрфнить сообщение в долговечном хранилище
-        await self.persist_message(message)
+        await self.persist_message(message, now)
+
+    async def send_history(self):
+        # Недавняя история из Redis (Postgres - только при холодном кэше)
+        await self.send(text_data=json.dumps({
+            'type': 'history',
+            'messages': await history.aget(int(self.id)),
+        }))
+
+    async def send_older(self, before, limit):
+        # Более старые сообщения постранично (keyset по id)
+        try:
+            page = await database_sync_to_async(history.fetch_page)(
+                int(self.id), before, limit
+            )
+        except (TypeError, ValueError):
+            return
+        await self.send(text_data=json.dumps({'type': 'older', **page}))
 
     # Получать сообщения из группы чат комнаты
-    async def chat_message(self, event):
-        # отправить сообщение в веб сокет
-        await self.send(text_data=json.dumps(event))
\ No newline at end of file
+    async def chat_frame(self, event):
+        # поставить готовые кадры в очередь соединения, не дожидаясь клиента
+        self.outbound.put(event['frames'])
@@ -0,0 +1,99 @@
+"""
+Рассылка сообщений чата в группу с однократной сериализацией.
+
+Каждое сообщение кодируется в JSON один раз - при отправке, а не в
+каждом ChatConsumer группы. Сообщения одной комнаты, пришедшие в течение
+COALESCE_MS, уходят в группу одним событием ``chat_frame`` со списком
+закодированных сообщений, поэтому в большой комнате на пачку сообщений
+приходится один group_send. Клиенту они отправляются кадром ``chat_batch``
+(см. chat.outbound).
+
+Для больших комнат слой каналов можно переключить на pub/sub
+(CHAT_FANOUT['LAYER'] = 'fanout'): RedisPubSubChannelLayer публикует
+сообщение группы один раз на процесс, а не копию в канал каждого участника.
+"""
+import asyncio
+import json
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def fanout_settings():
+    return getattr(settings, 'CHAT_FANOUT', {})
+
+
+def chat_layer_alias():
+    return fanout_settings().get('LAYER', 'default')
+
+
+def encode_message(user, message, sent_on):
+    """Кадр одного сообщения - в том виде, в котором его получит клиент."""
+    return json.dumps({
+        'type': 'chat_message',
+        'message': message,
+        'user': user,
+        'datetime': sent_on.isoformat(),
+    })
+
+
+def batch_frame(frames):
+    """Склеить уже закодированные кадры без повторной сериализации."""
+    if len(frames) == 1:
+        return frames[0]
+    return '{"type": "chat_batch", "messages": [' + ', '.join(frames) + ']}'
+
+
+class FrameCoalescer:
+    """Копит кадры по группам и отправляет их пачками через group_send."""
+
+    def __init__(self, coalesce_ms=5, max_frames=50):
+        self.delay = coalesce_ms / 1000
+        self.max_frames = max_frames
+        self._pending = {}
+
+    @classmethod
+    def from_settings(cls):
+        options = fanout_settings()
+        return cls(
+            coalesce_ms=options.get('COALESCE_MS', 5),
+            max_frames=options.get('MAX_FRAMES', 50),
+        )
+
+    async def publish(self, channel_layer, group, frame):
+        if self.delay <= 0:
+            await self._send(channel_layer, group, [frame])
+            return
+        frames = self._pending.get(group)
+        if frames is None:
+            frames = self._pending[group] = []
+            asyncio.get_running_loop().call_later(
+                self.delay, self._schedule_flush, channel_layer, group
+            )
+        frames.append(frame)
+        if len(frames) >= self.max_frames:
+            await self._flush(channel_layer, group)
+
+    def _schedule_flush(self, channel_layer, group):
+        if group in self._pending:
+            asyncio.ensure_future(self._flush(channel_layer, group))
+
+    async def _flush(self, channel_layer, group):
+        frames = self._pending.pop(group, None)
+        if frames:
+            await self._send(channel_layer, group, frames)
+
+    @staticmethod
+    async def _send(channel_layer, group, frames):
+        try:
+            await channel_layer.group_send(group, {
+                'type': 'chat_frame',
+                'frames': frames,
+            })
+        except Exception as e:
+            logger.error(f"Chat fan-out error ({len(frames)} frames): {e}")
+
+
+frame_coalescer = FrameCoalescer.from_settings()
@@ -0,0 +1,209 @@
+"""
+Недавняя история чата курса в Redis.
+
+Для каждого курса хранится список последних CHAT_HISTORY_DEPTH сообщений
+(индекс 0 - самое новое) в JSON-формате живых сообщений чата
+(id, user, message, datetime). Список пополняется через LPUSHX/LTRIM
+после записи пачки сообщений в БД, поэтому у всех элементов есть id.
+
+LPUSHX не создаёт список: холодный (отсутствующий) список заполняется
+из Postgres при первом чтении. Если сообщений ещё нет, ставится короткий
+маркер пустой комнаты, чтобы не ходить в БД на каждое открытие.
+
+Каждый apush увеличивает версию курса. Прогрев запоминает версию до
+чтения БД и записывает список, только если версия не изменилась: иначе
+сообщение, записанное между чтением БД и прогревом, пропало бы из
+списка (LPUSHX в холодный список ничего не делает) на весь HISTORY_TTL.
+Такой прогрев пропускается, список заполнит следующее чтение.
+"""
+import json
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from chat.models import ArchivedMessage, Message
+from utils.redis_utils import get_async_redis, redis_client
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TTL = 3600
+EMPTY_TTL = 60
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+# Заполнить список (или поставить маркер пустой комнаты), только если его
+# ещё никто не создал и с момента чтения БД не было новых сообщений.
+# KEYS: список, маркер пустой комнаты, версия; ARGV: версия до чтения БД,
+# TTL списка, TTL маркера, сообщения
+WARM_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+if (redis.call('get', KEYS[3]) or '') ~= ARGV[1] then
+    return 0
+end
+if #ARGV > 3 then
+    redis.call('rpush', KEYS[1], unpack(ARGV, 4))
+    redis.call('expire', KEYS[1], ARGV[2])
+else
+    redis.call('set', KEYS[2], 1, 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+def history_depth():
+    return getattr(settings, 'CHAT_HISTORY_DEPTH', 50)
+
+
+def history_key(course_id):
+    return f"educa:chat:course:{course_id}:recent"
+
+
+def empty_key(course_id):
+    return f"educa:chat:course:{course_id}:recent:empty"
+
+
+def version_key(course_id):
+    return f"educa:chat:course:{course_id}:recent:version"
+
+
+def _warm_args(course_id, version, raw):
+    keys = (history_key(course_id), empty_key(course_id), version_key(course_id))
+    return (WARM_SCRIPT, len(keys), *keys, version or '', HISTORY_TTL, EMPTY_TTL, *raw)
+
+
+def serialize(message_id, username, content, sent_on):
+    return json.dumps({
+        'id': message_id,
+        'user': username,
+        'message': content,
+        'datetime': sent_on.isoformat(),
+    })
+
+
+def load_from_db(course_id, depth):
+    """Последние сообщения из БД (новые первыми), уже сериализованные."""
+    messages = Message.objects.filter(
+        course_id=course_id
+    ).select_related('user').order_by('-id')[:depth]
+    return [
+        serialize(m.id, m.user.username, m.content, m.sent_on)
+        for m in messages
+    ]
+
+
+def _decode(raw):
+    # В Redis новые первыми, клиентам отдаём в хронологическом порядке
+    return [json.loads(item) for item in reversed(raw)]
+
+
+async def apush(entries):
+    """Добавить записанные в БД сообщения в списки их курсов."""
+    depth = history_depth()
+    pipe = get_async_redis().pipeline(transaction=False)
+    courses = set()
+    for entry in entries:
+        course_id = entry['course_id']
+        courses.add(course_id)
+        pipe.lpushx(
+            history_key(course_id),
+            serialize(entry['id'], entry['username'], entry['content'], entry['sent_on'])
+        )
+    for course_id in courses:
+        pipe.ltrim(history_key(course_id), 0, depth - 1)
+        pipe.delete(empty_key(course_id))
+        # Прогрев, начатый до этой записи, не должен создать список без неё
+        pipe.incr(version_key(course_id))
+        pipe.expire(version_key(course_id), HISTORY_TTL)
+    await pipe.execute()
+
+
+async def aget(course_id):
+    """История для WebSocket: из Redis, а при холодном списке - из БД."""
+    depth = history_depth()
+    redis = get_async_redis()
+    try:
+        raw, empty, version = await redis.pipeline(transaction=False).lrange(
+            history_key(course_id), 0, depth - 1
+        ).exists(empty_key(course_id)).get(version_key(course_id)).execute()
+    except Exception as e:
+        logger.error(f"Chat history read error: {e}")
+        raw = await database_sync_to_async(load_from_db)(course_id, depth)
+        return _decode(raw)
+    if raw or empty:
+        return _decode(raw)
+    raw = await database_sync_to_async(load_from_db)(course_id, depth)
+    try:
+        await redis.eval(*_warm_args(course_id, version, raw))
+    except Exception as e:
+        logger.error(f"Chat history warm error: {e}")
+    return _decode(raw)
+
+
+def get(course_id):
+    """Синхронный вариант aget() для представлений."""
+    depth = history_depth()
+    if not redis_client:
+        return _decode(load_from_db(course_id, depth))
+    try:
+        raw, empty, version = redis_client.pipeline(transaction=False).lrange(
+            history_key(course_id), 0, depth - 1
+        ).exists(empty_key(course_id)).get(version_key(course_id)).execute()
+    except Exception as e:
+        logger.error(f"Chat history read error: {e}")
+        return _decode(load_from_db(course_id, depth))
+    if raw or empty:
+        return _decode(raw)
+    raw = load_from_db(course_id, depth)
+    try:
+        redis_client.eval(*_warm_args(course_id, version, raw))
+    except Exception as e:
+        logger.error(f"Chat history warm error: {e}")
+    return _decode(raw)
+
+
+def _page_rows(manager, course_id, before, count):
+    messages = manager.filter(course_id=course_id)
+    if before:
+        messages = messages.filter(id__lt=before)
+    return list(
+        messages.order_by('-id').values_list(
+            'id', 'user_id', 'content', 'sent_on'
+        )[:count]
+    )
+
+
+def fetch_page(course_id, before=None, limit=PAGE_SIZE):
+    """
+    Страница более старых сообщений (keyset по (course_id, id)).
+
+    Возвращает компактный ответ: пользователи страницы один раз в ``users``,
+    сообщения - списками [id, user_id, content, datetime] в хронологическом
+    порядке, ``next_before`` - курсор следующей страницы или None.
+
+    Архив (ArchivedMessage) читается, только если основная таблица
+    закончилась раньше страницы: id при архивации сохраняются.
+    """
+    limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+    rows = _page_rows(Message.objects, course_id, before, limit + 1)
+    if len(rows) <= limit:
+        cursor = rows[-1][0] if rows else before
+        rows += _page_rows(
+            ArchivedMessage.objects, course_id, cursor, limit + 1 - len(rows)
+        )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    users = User.objects.filter(
+        id__in={row[1] for row in rows}
+    ).values_list('id', 'username')
+    return {
+        'users': {str(user_id): username for user_id, username in users},
+        'messages': [
+            [message_id, user_id, content, sent_on.isoformat()]
+            for message_id, user_id, content, sent_on in reversed(rows)
+        ],
+        'next_before': rows[-1][0] if has_more else None,
+    }
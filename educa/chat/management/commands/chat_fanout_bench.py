@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+
+from channels.layers import channel_layers
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.fanout import FrameCoalescer, batch_frame, encode_message
+
+
+class Command(BaseCommand):
+    help = 'Compares chat fan-out through the per-member channel layer ' \
+           'and the pub/sub layer with encode-once batched frames'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--messages', type=int, default=100)
+        parser.add_argument('--current-layer', default='default')
+        parser.add_argument('--fanout-layer', default='fanout')
+        parser.add_argument('--coalesce-ms', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'members':>8} {'mode':>8} {'seconds':>9} {'msg/s':>10} {'frames':>8}")
+        for members in options['members']:
+            for mode, alias in (('current', options['current_layer']),
+                                ('fanout', options['fanout_layer'])):
+                elapsed, frames = asyncio.run(self.run_case(
+                    mode, alias, members, options['messages'], options['coalesce_ms']
+                ))
+                rate = options['messages'] / elapsed if elapsed else 0
+                self.stdout.write(
+                    f"{members:>8} {mode:>8} {elapsed:>9.3f} {rate:>10.0f} {frames:>8}"
+                )
+
+    async def run_case(self, mode, alias, members, messages, coalesce_ms):
+        # Свой экземпляр слоя на каждый прогон: не делим соединения между циклами
+        layer = channel_layers.make_backend(alias)
+        group = f'bench_{mode}_{members}_{time.monotonic_ns()}'
+        channels = [await layer.new_channel() for _ in range(members)]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        async def member(channel):
+            received = frames = 0
+            while received < messages:
+                event = await layer.receive(channel)
+                if mode == 'current':
+                    # Как прежний chat_message: json.dumps в каждом участнике
+                    json.dumps(event)
+                    received += 1
+                else:
+                    # Как chat_frame: готовые кадры склеиваются без сериализации
+                    batch_frame(event['frames'])
+                    received += len(event['frames'])
+                frames += 1
+            return frames
+
+        started = time.perf_counter()
+        receivers = [asyncio.create_task(member(channel)) for channel in channels]
+        now = timezone.now()
+        if mode == 'current':
+            for i in range(messages):
+                await layer.group_send(group, {
+                    'type': 'chat_message',
+                    'message': f'message {i}',
+                    'user': 'bench',
+                    'datetime': now.isoformat(),
+                })
+        else:
+            coalescer = FrameCoalescer(coalesce_ms=coalesce_ms)
+            for i in range(messages):
+                await coalescer.publish(layer, group, encode_message('bench', f'message {i}', now))
+        frames = await asyncio.gather(*receivers)
+        elapsed = time.perf_counter() - started
+
+        for channel in channels:
+            await layer.group_discard(group, channel)
+        if hasattr(layer, 'flush'):
+            await layer.flush()
+        return elapsed, frames[0] if frames else 0
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import time
+import uuid
+import weakref
+from contextlib import ExitStack
+from unittest import mock
+
+import redis
+import redis.asyncio as aioredis
+
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import re_path
+
+from chat.buffer import message_buffer
+from chat.consumers import ChatConsumer
+from chat.models import Message
+from courses.models import Course, Subject
+
+LOADTEST_LAYER = 'loadtest'
+
+# Модули, которые пишут в Redis состояние курсов: membership, история, метрики
+REDIS_STATE_MODULES = [
+    'utils.redis_utils', 'chat.buffer', 'chat.history', 'chat.metrics',
+    'courses.membership',
+]
+
+
+def make_layer(kind, redis_url):
+    if kind == 'memory':
+        from channels.layers import InMemoryChannelLayer
+        return InMemoryChannelLayer(capacity=10000)
+    # Свой префикс: группы chat_<id> тестовых курсов не пересекаются с
+    # настоящими (PUBLISH не учитывает номер базы Redis)
+    prefix = f'loadtest-{uuid.uuid4().hex}'
+    if kind == 'redis':
+        from channels_redis.core import RedisChannelLayer
+        return RedisChannelLayer(hosts=[redis_url], prefix=prefix, capacity=10000)
+    from channels_redis.pubsub import RedisPubSubChannelLayer
+    return RedisPubSubChannelLayer(hosts=[redis_url], prefix=prefix)
+
+
+def redis_location(url):
+    kwargs = redis.ConnectionPool.from_url(url).connection_kwargs
+    host = kwargs.get('host')
+    if host == 'localhost':
+        host = '127.0.0.1'
+    return host, kwargs.get('port', 6379), int(kwargs.get('db') or 0)
+
+
+def reject_application_redis(option, url):
+    production = {redis_location(settings.REDIS_URL), ('cache', 6379, 0)}
+    if redis_location(url) in production:
+        raise CommandError(
+            f'{option} {url} points at the application Redis; '
+            'use a scratch database, e.g. redis://localhost:6379/15'
+        )
+
+
+def isolated_redis(url):
+    """
+    Направить Redis-состояние приложения и кэш Django в отдельную базу.
+
+    Тестовые курсы получают id из тестовой БД и совпадают с настоящими:
+    без изоляции прогон перезаписал бы их списки студентов и историю чата.
+    """
+    reject_application_redis('--state-redis-url', url)
+    sync_client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=5)
+    async_clients = weakref.WeakKeyDictionary()
+
+    def get_async_redis():
+        loop = asyncio.get_running_loop()
+        if loop not in async_clients:
+            async_clients[loop] = aioredis.from_url(
+                url, decode_responses=True, socket_timeout=5
+            )
+        return async_clients[loop]
+
+    stack = ExitStack()
+    for module in REDIS_STATE_MODULES:
+        stack.enter_context(mock.patch(f'{module}.get_async_redis', get_async_redis, create=True))
+        stack.enter_context(mock.patch(f'{module}.redis_client', sync_client, create=True))
+    stack.enter_context(override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }))
+    return stack
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = 'Load-tests ChatConsumer with simulated WebSocket clients against ' \
+           'a throwaway test database and reports throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--room-sizes', type=int, nargs='+', default=[10, 100, 500])
+        parser.add_argument('--rates', type=int, nargs='+', default=[10, 50],
+                            help='messages per second sent into each room')
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--senders', type=int, default=5,
+                            help='clients per room that send messages')
+        parser.add_argument('--layer', choices=['memory', 'redis', 'pubsub'], default='memory')
+        parser.add_argument('--redis-url',
+                            help='scratch Redis for --layer redis/pubsub '
+                                 '(must differ from REDIS_URL)')
+        parser.add_argument('--state-redis-url',
+                            help='scratch Redis for membership and chat history '
+                                 '(must differ from REDIS_URL), e.g. redis://localhost:6379/15')
+        parser.add_argument('--grace', type=float, default=5,
+                            help='seconds to wait for outstanding deliveries')
+        parser.add_argument('--keepdb', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['state_redis_url']:
+            raise CommandError(
+                '--state-redis-url is required: the run writes course membership '
+                'and chat history to Redis under ids that exist in production'
+            )
+        if options['layer'] != 'memory':
+            if not options['redis_url']:
+                raise CommandError(f"--layer {options['layer']} requires --redis-url")
+            reject_application_redis('--redis-url', options['redis_url'])
+        with isolated_redis(options['state_redis_url']):
+            self.run_benchmark(options)
+
+    def run_benchmark(self, options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, keepdb=options['keepdb'])
+        # Spill stream нужен только для надёжности, здесь он лишь шумит
+        message_buffer.spill_to_redis = False
+        try:
+            users = self.create_users(max(options['room_sizes']))
+            self.stdout.write(
+                f"layer={options['layer']} duration={options['duration']}s "
+                f"senders={options['senders']}"
+            )
+            self.stdout.write(
+                f"{'room':>6} {'rate':>6} {'sent':>7} {'deliv/s':>9} "
+                f"{'p50 ms':>8} {'p99 ms':>8} {'lost':>6} {'db ins/s':>9}"
+            )
+            for size in options['room_sizes']:
+                for rate in options['rates']:
+                    course = self.create_course(users[:size], size, rate)
+                    result = asyncio.run(self.run_case(course, users[:size], rate, options))
+                    self.stdout.write(
+                        f"{size:>6} {rate:>6} {result['sent']:>7} "
+                        f"{result['deliveries_per_sec']:>9.0f} {result['p50']:>8.1f} "
+                        f"{result['p99']:>8.1f} {result['lost']:>6} "
+                        f"{result['db_inserts_per_sec']:>9.0f}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+    def create_users(self, count):
+        User.objects.bulk_create(
+            [User(username=f'loadtest-{i}') for i in range(count)],
+            ignore_conflicts=True,
+        )
+        return list(User.objects.filter(username__startswith='loadtest-').order_by('id')[:count])
+
+    def create_course(self, users, size, rate):
+        subject, _ = Subject.objects.get_or_create(slug='loadtest', defaults={'title': 'Load test'})
+        slug = f'loadtest-{size}-{rate}-{time.monotonic_ns()}'
+        course = Course.objects.create(
+            owner=users[0], subject=subject, title=slug, slug=slug, overview=''
+        )
+        course.students.add(*users)
+        return course
+
+    async def run_case(self, course, users, rate, options):
+        channel_layers.set(LOADTEST_LAYER, make_layer(options['layer'], options['redis_url']))
+        application = URLRouter([
+            re_path(
+                r'ws/chat/room/(?P<course_id>\d+)/$',
+                ChatConsumer.as_asgi(channel_layer_alias=LOADTEST_LAYER),
+            ),
+        ])
+        clients = []
+        for user in users:
+            client = WebsocketCommunicator(application, f'/ws/chat/room/{course.id}/')
+            client.scope['user'] = user
+            connected, _ = await client.connect(timeout=10)
+            if not connected:
+                raise CommandError(f'Client {user.username} was rejected')
+            clients.append(client)
+
+        latencies = []
+        sent = 0
+
+        async def receive(client):
+            while True:
+                data = json.loads(await client.receive_from(timeout=3600))
+                messages = data['messages'] if data['type'] == 'chat_batch' else [data]
+                now = time.perf_counter()
+                for message in messages:
+                    latencies.append(now - float(message['message']))
+
+        receivers = [asyncio.create_task(receive(client)) for client in clients]
+        senders = clients[:max(1, min(options['senders'], len(clients)))]
+        interval = 1 / rate
+        inserted_before = await Message.objects.filter(course=course).acount()
+        started = time.perf_counter()
+        while time.perf_counter() - started < options['duration']:
+            sender = senders[sent % len(senders)]
+            await sender.send_to(text_data=json.dumps({'message': repr(time.perf_counter())}))
+            sent += 1
+            await asyncio.sleep(max(0, started + sent * interval - time.perf_counter()))
+        # Даём доставке догнать отправку, но не дольше grace секунд
+        expected = sent * len(clients)
+        deadline = time.perf_counter() + options['grace']
+        while len(latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        for receiver in receivers:
+            receiver.cancel()
+        await asyncio.gather(*receivers, return_exceptions=True)
+
+        await message_buffer.close()
+        inserted = await Message.objects.filter(course=course).acount() - inserted_before
+
+        for client in clients:
+            await client.disconnect()
+        return {
+            'sent': sent,
+            'deliveries_per_sec': len(latencies) / elapsed if elapsed else 0,
+            'p50': percentile(latencies, 50) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'lost': expected - len(latencies),
+            'db_inserts_per_sec': inserted / options['duration'],
+        }
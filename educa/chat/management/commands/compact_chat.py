@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from chat.retention import compact
+
+
+class Command(BaseCommand):
+    help = 'Moves chat messages past their course retention into the archive ' \
+           'table and purges expired archived messages, in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int)
+        parser.add_argument('--max-batches', dest='max_batches', type=int)
+
+    def handle(self, *args, **options):
+        archived, purged = compact(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(f'Archived {archived} messages, purged {purged}')
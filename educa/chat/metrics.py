@@ -0,0 +1,85 @@
+"""
+Метрики исходящих очередей чата.
+
+Счётчики живут в процессе Daphne, а смотрят их через представление,
+которое обслуживает uWSGI. Поэтому каждый процесс раз в PUBLISH_INTERVAL
+секунд пишет свой снимок в Redis (ключ с TTL), а ``collect()`` собирает
+снимки всех живых процессов.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+
+from utils.redis_utils import get_async_redis, redis_client
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = 'educa:chat:metrics'
+PUBLISH_INTERVAL = 10
+
+
+class OutboundMetrics:
+    def __init__(self):
+        self.process = f"{socket.gethostname()}-{os.getpid()}"
+        self.queues = set()
+        self.dropped = 0
+        self.coalesced = 0
+        self.slow_disconnects = 0
+        self._task = None
+
+    def register(self, queue):
+        self.queues.add(queue)
+        # Новый event loop (например, в нагрузочном тесте) - новая задача
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._publish())
+
+    def unregister(self, queue):
+        self.queues.discard(queue)
+
+    def snapshot(self):
+        depths = [queue.depth for queue in self.queues]
+        return {
+            'process': self.process,
+            'connections': len(depths),
+            'queued_frames': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'slow_disconnects': self.slow_disconnects,
+        }
+
+    async def _publish(self):
+        key = f"{METRICS_PREFIX}:{self.process}"
+        while True:
+            try:
+                await get_async_redis().set(
+                    key, json.dumps(self.snapshot()), ex=PUBLISH_INTERVAL * 3
+                )
+            except Exception as e:
+                logger.error(f"Chat metrics publish error: {e}")
+            await asyncio.sleep(PUBLISH_INTERVAL)
+
+
+def collect():
+    """Снимки всех процессов и их сумма (для представления)."""
+    processes = []
+    if redis_client:
+        try:
+            keys = list(redis_client.scan_iter(match=f"{METRICS_PREFIX}:*"))
+            processes = [json.loads(raw) for raw in redis_client.mget(keys) if raw] if keys else []
+        except Exception as e:
+            logger.error(f"Chat metrics read error: {e}")
+    totals = {
+        'connections': sum(p['connections'] for p in processes),
+        'queued_frames': sum(p['queued_frames'] for p in processes),
+        'max_queue_depth': max((p['max_queue_depth'] for p in processes), default=0),
+        'dropped': sum(p['dropped'] for p in processes),
+        'coalesced': sum(p['coalesced'] for p in processes),
+        'slow_disconnects': sum(p['slow_disconnects'] for p in processes),
+    }
+    return {'totals': totals, 'processes': processes}
+
+
+outbound_metrics = OutboundMetrics()
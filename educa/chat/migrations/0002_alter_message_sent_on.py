@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='sent_on',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_alter_message_sent_on'),
+        ('courses', '0007_studentprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['course', 'id'], name='chat_messag_course__fce036_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_course_id_index'),
+        ('courses', '0007_studentprogress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatRetention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hot_days', models.PositiveIntegerField(help_text='Days messages stay in the main table before archiving')),
+                ('archive_days', models.PositiveIntegerField(blank=True, help_text='Days archived messages are kept; empty keeps them forever', null=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='chat_retention', to='courses.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('sent_on', models.DateTimeField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_chat_messages', to='courses.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_chat_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'id'], name='chat_archiv_course__e1b71a_idx'), models.Index(fields=['course', 'sent_on'], name='chat_archiv_course__3c4861_idx')],
+            },
+        ),
+    ]
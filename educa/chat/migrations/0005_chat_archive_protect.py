@@ -0,0 +1,26 @@
+# Generated by Django 5.0.14 on 2026-10-19 16:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chat_archive_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedmessage',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chat_messages', to='courses.course'),
+        ),
+        migrations.AlterField(
+            model_name='archivedmessage',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_chat_messages', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
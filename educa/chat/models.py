@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class Message(models.Model):
@@ -14,8 +15,66 @@ class Message(models.Model):
         related_name='chat_messages'
     )
     content = models.TextField()
-    sent_on = models.DateTimeField(auto_now_add=True)
+    # Время отправки, а не вставки: сообщения пишутся пачками из буфера
+    sent_on = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Keyset-пагинация истории: WHERE course_id = ? AND id < ? ORDER BY id DESC
+            models.Index(fields=['course', 'id']),
+        ]
 
     def __str__(self):
-        return f'{self.user} on {self.course} at {self.sent_on}'
\ No newline at end of file
+        return f'{self.user} on {self.course} at {self.sent_on}'
+
+class ArchivedMessage(models.Model):
+    """
+    Сообщения старше срока хранения в основной таблице.
+
+    Переносятся командой compact_chat с сохранением id, поэтому keyset-
+    пагинация истории продолжается здесь без разрыва. В горячий путь
+    (комната, недавняя история) эта таблица не попадает.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name='archived_chat_messages'
+    )
+    course = models.ForeignKey(
+        'courses.Course',
+        on_delete=models.PROTECT,
+        related_name='archived_chat_messages'
+    )
+    content = models.TextField()
+    sent_on = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'id']),
+            # Очистка архива по сроку хранения курса
+            models.Index(fields=['course', 'sent_on']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} on {self.course} at {self.sent_on} (archived)'
+
+
+class ChatRetention(models.Model):
+    """Срок хранения чата курса; без записи действуют CHAT_RETENTION."""
+    course = models.OneToOneField(
+        'courses.Course',
+        on_delete=models.CASCADE,
+        related_name='chat_retention'
+    )
+    hot_days = models.PositiveIntegerField(
+        help_text='Days messages stay in the main table before archiving'
+    )
+    archive_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Days archived messages are kept; empty keeps them forever'
+    )
+
+    def __str__(self):
+        return f'Chat retention for {self.course}'
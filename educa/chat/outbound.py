@@ -0,0 +1,129 @@
+"""
+Ограниченная исходящая очередь WebSocket-соединения чата.
+
+chat_frame() только кладёт кадры в очередь и сразу возвращается, а
+отдельная задача соединения отправляет их клиенту. Медленный клиент
+не задерживает разбор канала и не раздувает его backlog в channels_redis.
+
+Когда очередь заполнена, срабатывает политика:
+  * ``coalesce``    - все ожидающие кадры склеиваются в один chat_batch;
+  * ``drop_oldest`` - выбрасывается самый старый кадр;
+  * ``drop_newest`` - выбрасывается новый кадр.
+Если после переполнения клиент не разгрёб очередь за
+SLOW_DISCONNECT_SECONDS, соединение закрывается с кодом
+SLOW_CONSUMER_CLOSE_CODE: клиент переподключится и получит историю заново.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from django.conf import settings
+
+from chat.fanout import batch_frame
+from chat.metrics import outbound_metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_CLOSE_CODE = 4008
+POLICIES = ('coalesce', 'drop_oldest', 'drop_newest')
+
+
+class OutboundQueue:
+    def __init__(self, send, close, max_size=100, policy='coalesce',
+                 slow_disconnect_seconds=10, metrics=outbound_metrics):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbound policy: {policy}")
+        self.send = send
+        self.close = close
+        self.max_size = max_size
+        self.policy = policy
+        self.slow_disconnect_seconds = slow_disconnect_seconds
+        self.metrics = metrics
+        # Элемент очереди - список закодированных сообщений одного кадра
+        self._items = deque()
+        self._ready = asyncio.Event()
+        self._overflow_since = None
+        self._closed = False
+        self._task = asyncio.get_running_loop().create_task(self._writer())
+        self.metrics.register(self)
+
+    @classmethod
+    def from_settings(cls, send, close):
+        options = getattr(settings, 'CHAT_OUTBOUND', {})
+        return cls(
+            send,
+            close,
+            max_size=options.get('MAX_QUEUE', 100),
+            policy=options.get('POLICY', 'coalesce'),
+            slow_disconnect_seconds=options.get('SLOW_DISCONNECT_SECONDS', 10),
+        )
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def put(self, frames):
+        if self._closed:
+            return
+        if (self._overflow_since is not None
+                and time.monotonic() - self._overflow_since >= self.slow_disconnect_seconds):
+            self._disconnect()
+            return
+        if len(self._items) >= self.max_size:
+            if self._overflow(frames):
+                return
+        self._items.append(list(frames))
+        self._ready.set()
+
+    def _overflow(self, frames):
+        """Применить политику; True - новый кадр уже учтён."""
+        if self._overflow_since is None:
+            self._overflow_since = time.monotonic()
+        if self.policy == 'coalesce':
+            merged = [frame for item in self._items for frame in item]
+            self.metrics.coalesced += len(self._items)
+            self._items.clear()
+            self._items.append(merged + list(frames))
+            self._ready.set()
+            return True
+        self.metrics.dropped += 1
+        if self.policy == 'drop_newest':
+            return True
+        self._items.popleft()
+        return False
+
+    def _disconnect(self):
+        logger.warning(
+            f"Closing slow chat connection: {len(self._items)} frames queued "
+            f"for {self.slow_disconnect_seconds}s"
+        )
+        self.metrics.slow_disconnects += 1
+        self.metrics.dropped += sum(len(item) for item in self._items)
+        self.stop()
+        asyncio.get_running_loop().create_task(
+            self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        )
+
+    async def _writer(self):
+        while True:
+            await self._ready.wait()
+            while self._items:
+                frames = self._items.popleft()
+                try:
+                    await self.send(text_data=batch_frame(frames))
+                except Exception as e:
+                    logger.warning(f"Chat outbound send failed: {e}")
+                    self.stop()
+                    return
+                if len(self._items) < self.max_size // 2:
+                    self._overflow_since = None
+            self._ready.clear()
+
+    def stop(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._items.clear()
+        self._task.cancel()
+        self.metrics.unregister(self)
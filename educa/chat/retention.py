@@ -0,0 +1,99 @@
+"""
+Перенос старых сообщений чата в архив и очистка архива.
+
+Работает небольшими пачками по (course_id, id): каждая пачка - отдельная
+короткая транзакция (INSERT в архив + DELETE из основной таблицы), поэтому
+компактация не держит долгих блокировок и её можно прервать в любой момент.
+Срок хранения задаётся ChatRetention курса или настройками CHAT_RETENTION.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from chat.models import ArchivedMessage, ChatRetention, Message
+from courses.models import Course
+
+logger = logging.getLogger(__name__)
+
+
+def retention_settings():
+    return getattr(settings, 'CHAT_RETENTION', {})
+
+
+def course_policies():
+    """{course_id: (hot_days, archive_days)} для всех курсов."""
+    options = retention_settings()
+    default = (options.get('HOT_DAYS', 90), options.get('ARCHIVE_DAYS'))
+    overrides = {
+        course_id: (hot_days, archive_days)
+        for course_id, hot_days, archive_days in ChatRetention.objects.values_list(
+            'course_id', 'hot_days', 'archive_days'
+        )
+    }
+    return {
+        course_id: overrides.get(course_id, default)
+        for course_id in Course.objects.values_list('id', flat=True)
+    }
+
+
+def archive_batch(course_id, cutoff, batch_size):
+    """Перенести в архив до batch_size сообщений старше cutoff."""
+    with transaction.atomic():
+        messages = list(
+            Message.objects.select_for_update().filter(
+                course_id=course_id, sent_on__lt=cutoff
+            ).order_by('id').values('id', 'user_id', 'course_id', 'content', 'sent_on')[:batch_size]
+        )
+        if not messages:
+            return 0
+        ArchivedMessage.objects.bulk_create(
+            [ArchivedMessage(**message) for message in messages],
+            ignore_conflicts=True,
+        )
+        Message.objects.filter(id__in=[message['id'] for message in messages]).delete()
+    return len(messages)
+
+
+def purge_batch(course_id, cutoff, batch_size):
+    """Удалить из архива до batch_size сообщений старше cutoff."""
+    ids = list(
+        ArchivedMessage.objects.filter(
+            course_id=course_id, sent_on__lt=cutoff
+        ).order_by('sent_on').values_list('id', flat=True)[:batch_size]
+    )
+    if ids:
+        ArchivedMessage.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def compact(batch_size=None, max_batches=None, now=None):
+    """
+    Архивировать и очистить чаты всех курсов.
+
+    ``max_batches`` ограничивает число пачек за запуск (по всем курсам),
+    остальное доделает следующий запуск. Возвращает (archived, purged).
+    """
+    options = retention_settings()
+    batch_size = batch_size or options.get('BATCH_SIZE', 1000)
+    now = now or timezone.now()
+    archived = purged = batches = 0
+
+    for course_id, (hot_days, archive_days) in course_policies().items():
+        steps = [(archive_batch, now - timedelta(days=hot_days))]
+        if archive_days is not None:
+            steps.append((purge_batch, now - timedelta(days=hot_days + archive_days)))
+        for step, cutoff in steps:
+            while max_batches is None or batches < max_batches:
+                count = step(course_id, cutoff, batch_size)
+                if not count:
+                    break
+                batches += 1
+                if step is archive_batch:
+                    archived += count
+                else:
+                    purged += count
+    logger.info(f"Chat compaction: {archived} archived, {purged} purged in {batches} batches")
+    return archived, purged
@@ -6,4 +6,10 @@ app_name = "chat"
 
 urlpatterns = [
     path("room/<int:course_id>/", views.course_chat_room, name="course_chat_room"),
+    path(
+        "room/<int:course_id>/history/",
+        views.course_chat_history,
+        name="course_chat_history",
+    ),
+    path("metrics/", views.chat_metrics, name="chat_metrics"),
 ]
@@ -1,7 +1,11 @@
+from datetime import datetime
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
 
+from chat import history, metrics
 from courses.models import Course
 
 
@@ -13,13 +17,31 @@ def course_chat_room(request, course_id):
     except Course.DoesNotExist:
         # user is not a student of the course or course does not exist
         return HttpResponseForbidden()
-    # retrieve chat history
-    latest_messages = course.chat_messages.select_related(
-        'user'
-    ).order_by('-id')[:5]
-    latest_messages = reversed(latest_messages)
+    # retrieve chat history (Redis ring buffer, Postgres when it is cold)
+    latest_messages = history.get(course.id)
+    for message in latest_messages:
+        message['sent_on'] = datetime.fromisoformat(message['datetime'])
     return render(
         request,
         'chat/room.html',
         {'course': course, 'latest_messages': latest_messages},
-    )
\ No newline at end of file
+    )
+
+
+@login_required
+def course_chat_history(request, course_id):
+    """Load older messages: ?before=<message id>&limit=<n>."""
+    if not request.user.courses_joined.filter(id=course_id).exists():
+        return HttpResponseForbidden()
+    try:
+        before = int(request.GET['before']) if request.GET.get('before') else None
+        limit = int(request.GET.get('limit', history.PAGE_SIZE))
+    except ValueError:
+        return HttpResponseBadRequest()
+    return JsonResponse(history.fetch_page(course_id, before, limit))
+
+
+@staff_member_required
+def chat_metrics(request):
+    """Outbound queue depth, drops and slow disconnects per Daphne process."""
+    return JsonResponse(metrics.collect())
@@ -0,0 +1,68 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+TOKEN_SALT = 'courses.api.token'
+
+
+def _password_fingerprint(user):
+    # Смена пароля меняет отпечаток, и старые токены перестают работать
+    return salted_hmac(TOKEN_SALT, user.password).hexdigest()[:16]
+
+
+def issue_token(user):
+    """Подписанный токен сессии API (без хранения на сервере)."""
+    return signing.dumps({'u': user.pk, 'p': _password_fingerprint(user)}, salt=TOKEN_SALT)
+
+
+def user_from_token(token):
+    """Пользователь по токену или None (подпись неверна, токен истёк или отозван)."""
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.API_AUTH['TOKEN_MAX_AGE'])
+    except signing.BadSignature:
+        return None
+    user = User.objects.filter(pk=data.get('u'), is_active=True).first()
+    if user is None or not constant_time_compare(data.get('p', ''), _password_fingerprint(user)):
+        return None
+    return user
+
+
+def basic_credentials(request):
+    """(логин, пароль) из заголовка Basic или тела запроса; None - если их нет."""
+    auth = get_authorization_header(request).split()
+    if len(auth) == 2 and auth[0].lower() == b'basic':
+        try:
+            username, _, password = base64.b64decode(auth[1]).decode().partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+        return username, password
+    username = request.data.get('username') if hasattr(request.data, 'get') else None
+    password = request.data.get('password') if hasattr(request.data, 'get') else None
+    if username and password:
+        return username, password
+    return None
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authorization: Token <токен из /api/auth/verify/>"""
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Invalid token header.')
+        user = user_from_token(auth[1].decode(errors='ignore'))
+        if user is None:
+            raise AuthenticationFailed('Invalid or expired token.')
+        return user, None
+
+    def authenticate_header(self, request):
+        return self.keyword
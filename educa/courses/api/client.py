@@ -58,9 +58,9 @@ class ApiClient:
         try:
             # Используем Basic Auth с учетными данными пользователя
             result = await self.make_request(
-                "courses/", 
+                "auth/verify/", 
                 auth=(username, password),
-                method="GET"
+                method="POST"
             )
             
             if result and "error" not in result:
@@ -21,7 +21,7 @@ class ContentSerializer(serializers.ModelSerializer):
 class ModuleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Module
-        fields = ["order", "title", "description"]
+        fields = ["id", "order", "title", "description"]
 
 
 class UserSimpleSerializer(serializers.ModelSerializer):
@@ -45,6 +45,7 @@ class CourseSerializer(serializers.ModelSerializer):
             "title",
             "slug",
             "overview",
+            "overview_excerpt",
             "created",
             "owner",
             "modules",
@@ -64,6 +65,14 @@ class CourseSerializer(serializers.ModelSerializer):
         return False
 
 
+class CourseListSerializer(CourseSerializer):
+    """Для списков: вместо HTML описания - короткая текстовая выдержка"""
+    class Meta(CourseSerializer.Meta):
+        fields = [
+            field for field in CourseSerializer.Meta.fields if field != "overview"
+        ]
+
+
 class SubjectSerializer(serializers.ModelSerializer):
     total_courses = serializers.IntegerField()
     popular_courses = serializers.SerializerMethodField()
@@ -84,7 +93,7 @@ class ModuleWithContentsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Module
-        fields = ["order", "title", "description", "contents"]
+        fields = ["id", "order", "title", "description", "contents"]
 
 
 class CourseWithContentsSerializer(serializers.ModelSerializer):
@@ -0,0 +1,32 @@
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from courses.api.authentication import basic_credentials
+
+
+class AuthVerifyThrottle(SimpleRateThrottle):
+    """
+    Попытки входа на один логин. Все логины бота приходят с одного IP,
+    поэтому считаем по имени пользователя, а без него - по адресу.
+    """
+    scope = 'auth_verify'
+
+    username = None
+
+    def get_cache_key(self, request, view):
+        if request is None:
+            username = self.username
+        else:
+            credentials = basic_credentials(request)
+            username = credentials[0] if credentials else None
+        if username is not None:
+            ident = 'user:' + hashlib.sha256(username.encode()).hexdigest()[:32]
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_username(self, username):
+        """Та же проверка без HTTP запроса (InProcessTransport бота)."""
+        self.username = username
+        return self.allow_request(None, None)
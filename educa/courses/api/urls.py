@@ -12,6 +12,13 @@ router.register("subjects", views.SubjectViewSet)
 urlpatterns = [
     path("", include(router.urls)),
     
+    # Проверка логина для бота и других клиентов
+    path(
+        "auth/verify/",
+        views.AuthVerifyAPIView.as_view(),
+        name="auth_verify"
+    ),
+    
     # User profile
     path(
         "user/profile/",
@@ -19,6 +26,13 @@ urlpatterns = [
         name="user_profile"
     ),
     
+    # Всё для экранов бота одним запросом
+    path(
+        "bot/home/",
+        views.BotHomeAPIView.as_view(),
+        name="bot_home"
+    ),
+    
     # Progress tracking endpoints
     path(
         "courses/<int:course_id>/progress/",
@@ -3,23 +3,28 @@ from django.db.models import Count
 from rest_framework import viewsets
 from rest_framework.authentication import BasicAuthentication
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.contrib.auth.models import User
 
+from courses import services
+from courses.api.authentication import SignedTokenAuthentication, basic_credentials
 from courses.api.pagination import StandartPagination
 from courses.api.permissions import IsEnrolled
+from courses.api.throttles import AuthVerifyThrottle
 from courses.api.serializers import (
+    CourseListSerializer,
     CourseSerializer,
     CourseWithContentsSerializer,
     SubjectSerializer,
-    UserSimpleSerializer,
 )
 from courses.models import Course, Subject
-from utils.redis_utils import CourseProgressTracker
+
+# Basic первым: его заголовок WWW-Authenticate уходит в ответах 401
+API_AUTHENTICATION = [BasicAuthentication, SignedTokenAuthentication]
 
 
 class SubjectViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,6 +38,25 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = CourseSerializer
     pagination_class = StandartPagination
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Пакетная загрузка: /api/courses/?ids=1,2,3 (одна страница на все id)
+        raw_ids = self.request.query_params.get('ids')
+        if raw_ids and self.action == 'list':
+            try:
+                queryset = queryset.filter(id__in=services.parse_ids(raw_ids))
+            except ValueError as e:
+                raise ValidationError({'ids': str(e)})
+        if self.action == 'list':
+            # Полное HTML описание в списке не нужно (см. overview_excerpt)
+            queryset = queryset.defer('overview')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ("list", "my_courses"):
+            return CourseListSerializer
+        return super().get_serializer_class()
+
     def get_serializer_context(self):
         """Добавляем request в контекст сериализатора"""
         context = super().get_serializer_context()
@@ -42,34 +66,55 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     @action(
         detail=True,
         methods=["post"],
-        authentication_classes=[BasicAuthentication],
+        authentication_classes=API_AUTHENTICATION,
         permission_classes=[IsAuthenticated],
     )
     def enroll(self, request, *args, **kwargs):
         course = self.get_object()
-        course.students.add(request.user)
-        return Response({"enrolled": True})
+        return Response(services.enroll(request.user, course))
 
     @action(
         detail=True,
         methods=["get"],
         serializer_class=CourseWithContentsSerializer,
-        authentication_classes=[BasicAuthentication],
+        authentication_classes=API_AUTHENTICATION,
         permission_classes=[IsAuthenticated, IsEnrolled],
     )
     def contents(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
+
+    @action(
+        detail=True,
+        methods=["get"],
+        authentication_classes=API_AUTHENTICATION,
+        permission_classes=[IsAuthenticated, IsEnrolled],
+        queryset=Course.objects.all(),
+        url_path=r"modules/(?P<module_id>\d+)/contents",
+    )
+    def module_contents(self, request, module_id, *args, **kwargs):
+        """Элементы одного модуля без HTML (тип, заголовок, выдержка, ссылка)"""
+        course = self.get_object()
+        module = get_object_or_404(course.modules, id=module_id)
+        payload = services.module_contents(module)
+        etag = f'"{payload["version"]}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(payload, headers={"ETag": etag})
     
     @action(
         detail=False,
         methods=["get"],
-        authentication_classes=[BasicAuthentication],
+        authentication_classes=API_AUTHENTICATION,
         permission_classes=[IsAuthenticated],
         url_path="my-courses"
     )
     def my_courses(self, request):
         """Курсы, на которые записан текущий пользователь"""
-        courses = Course.objects.filter(students=request.user).prefetch_related("modules")
+        courses = (
+            Course.objects.filter(students=request.user)
+            .defer("overview")
+            .prefetch_related("modules")
+        )
         
         page = self.paginate_queryset(courses)
         if page is not None:
@@ -80,11 +125,36 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 
+class AuthVerifyAPIView(APIView):
+    """
+    Проверка логина и пароля (Basic или username/password в теле):
+    id пользователя и токен для Authorization: Token.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [AuthVerifyThrottle]
+
+    def post(self, request):
+        credentials = basic_credentials(request)
+        if credentials is None:
+            return Response(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        user = services.verify_credentials(*credentials)
+        if user is None:
+            return Response(
+                {"detail": "Invalid username/password."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        return Response(services.auth_verify(user))
+
+
 class CourseProgressAPIView(APIView):
     """
     API for course progress tracking.
     """
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = API_AUTHENTICATION
     permission_classes = [IsAuthenticated]
     
     def get(self, request, course_id=None):
@@ -94,65 +164,23 @@ class CourseProgressAPIView(APIView):
             course = get_object_or_404(Course, id=course_id)
             
             # Check enrollment
-            if not course.students.filter(id=request.user.id).exists():
+            if not services.is_enrolled(request.user, course):
                 return Response(
                     {'error': 'Not enrolled in this course'},
                     status=status.HTTP_403_FORBIDDEN
                 )
             
-            progress_data = {
-                'course_id': course.id,
-                'course_title': course.title,
-                'last_module': CourseProgressTracker.get_last_module(
-                    request.user.id, 
-                    course.id
-                ),
-                'completed_modules': list(CourseProgressTracker.get_completed_modules(
-                    request.user.id, 
-                    course.id
-                )),
-                'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
-                    request.user.id,
-                    course.id,
-                    course.modules.count()
-                ),
-                'total_modules': course.modules.count(),
-            }
-            
-            return Response(progress_data)
+            return Response(services.course_progress(request.user, course))
         else:
             # All courses progress
-            enrolled_courses = Course.objects.filter(students=request.user)
-            
-            progress_list = []
-            for course in enrolled_courses:
-                progress_list.append({
-                    'course_id': course.id,
-                    'course_title': course.title,
-                    'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
-                        request.user.id,
-                        course.id,
-                        course.modules.count()
-                    ),
-                    'last_module': CourseProgressTracker.get_last_module(
-                        request.user.id, 
-                        course.id
-                    ),
-                    'completed_modules_count': len(CourseProgressTracker.get_completed_modules(
-                        request.user.id, 
-                        course.id
-                    )),
-                    'total_modules': course.modules.count(),
-                })
-            
-            return Response({'courses': progress_list})
+            return Response(services.all_progress(request.user))
     
     def post(self, request, course_id):
         """Update progress."""
         course = get_object_or_404(Course, id=course_id)
         
         # Check enrollment
-        if not course.students.filter(id=request.user.id).exists():
+        if not services.is_enrolled(request.user, course):
             return Response(
                 {'error': 'Not enrolled in this course'},
                 status=status.HTTP_403_FORBIDDEN
@@ -175,194 +203,35 @@ class CourseProgressAPIView(APIView):
             )
         
         # Update progress
-        if completed:
-            CourseProgressTracker.mark_module_completed(
-                request.user.id,
-                course.id,
-                module_id,
-                completed=True
-            )
-        else:
-            CourseProgressTracker.set_last_module(
-                request.user.id,
-                course.id,
-                module_id
-            )
-        
-        return Response({
-            'status': 'success',
-            'course_id': course.id,
-            'module_id': module_id,
-            'completed': completed
-        })
+        return Response(
+            services.update_progress(request.user, course, module_id, completed)
+        )
 
 
 class UserProfileAPIView(APIView):
     """
     API для получения профиля пользователя
     """
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = API_AUTHENTICATION
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Получить профиль пользователя"""
-        user = request.user
-        
-        # Получаем статистику
-        enrolled_courses_count = Course.objects.filter(students=user).count()
-        completed_courses_count = 0  # Нужно добавить логику подсчета завершенных курсов
-        
-        # Получаем прогресс по всем курсам
-        enrolled_courses = Course.objects.filter(students=user)
-        total_progress = 0
-        
-        for course in enrolled_courses:
-            progress = CourseProgressTracker.get_course_progress_percentage(
-                user.id,
-                course.id,
-                course.modules.count()
-            )
-            total_progress += progress
-        
-        avg_progress = total_progress / enrolled_courses_count if enrolled_courses_count > 0 else 0
-        
-        profile_data = {
-            'user': UserSimpleSerializer(user).data,
-            'statistics': {
-                'enrolled_courses': enrolled_courses_count,
-                'completed_courses': completed_courses_count,
-                'average_progress': round(avg_progress, 2),
-                'total_courses_available': Course.objects.count(),
-            },
-            'enrolled_courses': [
-                {
-                    'id': course.id,
-                    'title': course.title,
-                    'progress': CourseProgressTracker.get_course_progress_percentage(
-                        user.id,
-                        course.id,
-                        course.modules.count()
-                    )
-                }
-                for course in enrolled_courses
-            ]
-        }
-        
-        return Response(profile_data)
+        return Response(services.user_profile(request.user))
+
+
+
+class BotHomeAPIView(APIView):
     """
-    API for course progress tracking.
+    Главный экран Telegram бота одним запросом: курсы с прогрессом,
+    последние модули, список желаемого и статистика
     """
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = API_AUTHENTICATION
     permission_classes = [IsAuthenticated]
     
-    def get(self, request, course_id=None):
-        """Get progress data."""
-        if course_id:
-            # Single course progress
-            course = get_object_or_404(Course, id=course_id)
-            
-            # Check enrollment
-            if not course.students.filter(id=request.user.id).exists():
-                return Response(
-                    {'error': 'Not enrolled in this course'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            progress_data = {
-                'course_id': course.id,
-                'course_title': course.title,
-                'last_module': CourseProgressTracker.get_last_module(
-                    request.user.id, 
-                    course.id
-                ),
-                'completed_modules': list(CourseProgressTracker.get_completed_modules(
-                    request.user.id, 
-                    course.id
-                )),
-                'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
-                    request.user.id,
-                    course.id,
-                    course.modules.count()
-                ),
-                'total_modules': course.modules.count(),
-            }
-            
-            return Response(progress_data)
-        else:
-            # All courses progress
-            enrolled_courses = Course.objects.filter(students=request.user)
-            
-            progress_list = []
-            for course in enrolled_courses:
-                progress_list.append({
-                    'course_id': course.id,
-                    'course_title': course.title,
-                    'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
-                        request.user.id,
-                        course.id,
-                        course.modules.count()
-                    ),
-                    'last_module': CourseProgressTracker.get_last_module(
-                        request.user.id, 
-                        course.id
-                    ),
-                    'completed_modules_count': len(CourseProgressTracker.get_completed_modules(
-                        request.user.id, 
-                        course.id
-                    )),
-                    'total_modules': course.modules.count(),
-                })
-            
-            return Response({'courses': progress_list})
-    
-    def post(self, request, course_id):
-        """Update progress."""
-        course = get_object_or_404(Course, id=course_id)
-        
-        # Check enrollment
-        if not course.students.filter(id=request.user.id).exists():
-            return Response(
-                {'error': 'Not enrolled in this course'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        module_id = request.data.get('module_id')
-        completed = request.data.get('completed', False)
-        
-        if not module_id:
-            return Response(
-                {'error': 'module_id is required'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Validate module
-        if not course.modules.filter(id=module_id).exists():
-            return Response(
-                {'error': 'Module not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        # Update progress
-        if completed:
-            CourseProgressTracker.mark_module_completed(
-                request.user.id,
-                course.id,
-                module_id,
-                completed=True
-            )
-        else:
-            CourseProgressTracker.set_last_module(
-                request.user.id,
-                course.id,
-                module_id
-            )
-        
-        return Response({
-            'status': 'success',
-            'course_id': course.id,
-            'module_id': module_id,
-            'completed': completed
-        })
+    def get(self, request):
+        return Response(services.bot_home(request.user))
+
     
 # class CourseEnrollView(APIView):
 #     authentication_classes = [BasicAuthentication]
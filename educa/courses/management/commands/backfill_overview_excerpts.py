@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import Course, overview_excerpt
+
+
+class Command(BaseCommand):
+    help = 'Fills Course.overview_excerpt from the HTML overview in batches ' \
+           '(for courses saved before the column existed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', dest='batch_size', type=int, default=500)
+        parser.add_argument('--all', action='store_true',
+                            help='recompute every course, not only empty excerpts')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.order_by('pk').only('pk', 'overview', 'overview_excerpt')
+        if not options['all']:
+            courses = courses.filter(overview_excerpt='')
+        last_pk = 0
+        updated = 0
+        while True:
+            # Ключевая пагинация по pk: каждый батч - один короткий запрос
+            batch = list(courses.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for course in batch:
+                excerpt = overview_excerpt(course.overview)
+                if excerpt != course.overview_excerpt:
+                    course.overview_excerpt = excerpt
+                    changed.append(course)
+            Course.objects.bulk_update(changed, ['overview_excerpt'])
+            updated += len(changed)
+        self.stdout.write(f'Updated {updated} course excerpts')
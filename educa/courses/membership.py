@@ -0,0 +1,133 @@
+"""
+Кэш записей на курсы в Redis.
+
+Для каждого курса хранится set id записанных студентов и служебный
+элемент WARM_MARKER: он отличает прогретый set (в том числе пустой курс)
+от отсутствующего. Проверка членства - одна команда SMISMEMBER без SQL.
+Set поддерживается сигналами m2m_changed на Course.students
+(courses/signals.py); холодный set заполняется из БД при первой проверке.
+Исключение из курса удаляет set целиком и сдвигает версию, запись в
+холодный курс тоже сдвигает версию: прогрев, прочитавший БД до изменения,
+не запишет устаревший состав.
+"""
+import logging
+
+from channels.db import database_sync_to_async
+
+from utils.redis_utils import get_async_redis, redis_client
+
+logger = logging.getLogger(__name__)
+
+WARM_MARKER = '*'
+MEMBERS_TTL = 86400
+
+# Дописать студентов только в прогретый set: холодный прогреется из БД целиком,
+# а сдвиг версии отбросит прогрев, прочитавший БД до этой записи.
+# KEYS: set, версия; ARGV: TTL, маркер, id студентов
+ADD_SCRIPT = """
+if redis.call('sismember', KEYS[1], ARGV[2]) == 1 then
+    redis.call('sadd', KEYS[1], unpack(ARGV, 3))
+else
+    redis.call('incr', KEYS[2])
+    redis.call('expire', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# Заполнить set, только если его ещё никто не создал и с момента чтения БД
+# состав курса не менялся. KEYS: set, версия; ARGV: версия до чтения БД, TTL,
+# маркер, id студентов
+WARM_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return 0
+end
+if (redis.call('get', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('sadd', KEYS[1], unpack(ARGV, 3))
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class CourseMembership:
+    @staticmethod
+    def key(course_id):
+        return f"educa:course:{course_id}:students"
+
+    @staticmethod
+    def version_key(course_id):
+        return f"educa:course:{course_id}:students:version"
+
+    @staticmethod
+    def load_member_ids(course_id):
+        from courses.models import Course
+        return list(
+            Course.students.through.objects.filter(
+                course_id=course_id
+            ).values_list('user_id', flat=True)
+        )
+
+    @staticmethod
+    def add(course_id, user_ids):
+        if not redis_client or not user_ids:
+            return
+        try:
+            redis_client.eval(
+                ADD_SCRIPT, 2,
+                CourseMembership.key(course_id), CourseMembership.version_key(course_id),
+                MEMBERS_TTL, WARM_MARKER, *user_ids,
+            )
+        except Exception as e:
+            logger.error(f"❌ CourseMembership.add error: {e}")
+
+    @staticmethod
+    def remove(course_id, user_ids):
+        if user_ids:
+            CourseMembership.invalidate(course_id)
+
+    @staticmethod
+    def invalidate(course_id):
+        if not redis_client:
+            return
+        try:
+            version_key = CourseMembership.version_key(course_id)
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.incr(version_key)
+            pipe.expire(version_key, MEMBERS_TTL)
+            pipe.delete(CourseMembership.key(course_id))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ CourseMembership.invalidate error: {e}")
+
+    @staticmethod
+    async def ais_member(course_id, user_id):
+        """Записан ли пользователь на курс (для WebSocket connect)."""
+        key = CourseMembership.key(course_id)
+        redis = get_async_redis()
+        version_key = CourseMembership.version_key(course_id)
+        try:
+            pipe = redis.pipeline(transaction=True)
+            pipe.smismember(key, [user_id, WARM_MARKER])
+            pipe.get(version_key)
+            (is_member, is_warm), version = await pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ CourseMembership.ais_member error: {e}")
+            member_ids = await database_sync_to_async(
+                CourseMembership.load_member_ids
+            )(course_id)
+            return user_id in member_ids
+        if is_warm:
+            return bool(is_member)
+
+        member_ids = await database_sync_to_async(
+            CourseMembership.load_member_ids
+        )(course_id)
+        try:
+            await redis.eval(
+                WARM_SCRIPT, 2, key, version_key,
+                version or '', MEMBERS_TTL, WARM_MARKER, *member_ids,
+            )
+        except Exception as e:
+            logger.error(f"❌ CourseMembership warm error: {e}")
+        return user_id in member_ids
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_studentprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='overview_excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+    ]
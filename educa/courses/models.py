@@ -3,11 +3,26 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from tinymce.models import HTMLField
 from .fields import OrderField
 from django.utils import timezone
+import html
 import json
 
+# Длина выдержки из описания курса для списков и бота
+OVERVIEW_EXCERPT_CHARS = 300
+
+
+def overview_excerpt(overview):
+    """Начало описания курса простым текстом (без HTML TinyMCE)."""
+    # Пробел перед тегами, чтобы соседние абзацы и пункты списков не склеивались
+    text = strip_tags((overview or '').replace('<', ' <'))
+    text = ' '.join(html.unescape(text).split())
+    return Truncator(text).chars(OVERVIEW_EXCERPT_CHARS)
+
+
 class Subject(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
@@ -33,6 +48,8 @@ class Course(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     overview = HTMLField()
+    # Заполняется в save() из overview, см. команду backfill_overview_excerpts
+    overview_excerpt = models.CharField(max_length=OVERVIEW_EXCERPT_CHARS, blank=True, editable=False)
     created = models.DateTimeField(auto_now_add=True)
     students = models.ManyToManyField(
         User,
@@ -46,6 +63,13 @@ class Course(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.overview_excerpt = overview_excerpt(self.overview)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'overview' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'overview_excerpt'}
+        super().save(*args, **kwargs)
+
 
 class Module(models.Model):
     course = models.ForeignKey(
@@ -0,0 +1,306 @@
+"""
+Сервисные функции курсов, записи и прогресса.
+
+Общие для REST API (courses.api.views) и внутрипроцессного транспорта
+Telegram бота (telegram_bot.transports), поэтому возвращают готовые
+для JSON словари и не зависят от request.
+"""
+import hashlib
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.crypto import salted_hmac
+from django.utils.text import Truncator
+
+from courses.models import Content, Course, Wishlist
+from utils.redis_utils import CourseProgressTracker, bot_home_key
+
+
+MAX_BATCH_IDS = 50
+
+# Страховка на случай пропущенной инвалидации (см. courses.signals)
+BOT_HOME_TTL = 300
+
+# Содержимое модуля меняется редко; сбрасывается сигналами Content и элементов
+MODULE_CONTENTS_TTL = 24 * 3600
+EXCERPT_CHARS = 300
+
+AUTH_FAILURE_SALT = 'courses.services.auth_failure'
+
+
+def parse_ids(raw):
+    """
+    Разобрать ``?ids=1,2,3`` для пакетных запросов.
+
+    Возвращает список id без повторов; ValueError - если значение не число
+    или id больше MAX_BATCH_IDS.
+    """
+    ids = list(dict.fromkeys(int(value) for value in raw.split(',') if value.strip()))
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f'At most {MAX_BATCH_IDS} ids are allowed')
+    return ids
+
+
+def _auth_failure_key(username, password, password_hash):
+    # Хэш пароля из БД в ключе: после смены пароля старые записи не мешают.
+    # HMAC на SECRET_KEY: по ключам в Redis нельзя перебирать пароли
+    digest = salted_hmac(
+        AUTH_FAILURE_SALT, f'{username}\0{password}\0{password_hash}'
+    ).hexdigest()
+    return f"educa:auth_fail:{digest}"
+
+
+def verify_credentials(username, password):
+    """
+    Пользователь или None. Неверная пара логин/пароль запоминается на
+    API_AUTH['FAILURE_CACHE_SECONDS']: повторная попытка стоит одного
+    запроса к БД вместо проверки хэша пароля.
+    """
+    stored = User.objects.filter(username=username).values_list('password', flat=True).first()
+    key = _auth_failure_key(username, password, stored or '')
+    if cache.get(key):
+        return None
+    user = authenticate(username=username, password=password)
+    if user is None or not user.is_active:
+        cache.set(key, 1, settings.API_AUTH['FAILURE_CACHE_SECONDS'])
+        return None
+    return user
+
+
+def auth_verify(user):
+    from courses.api.authentication import issue_token
+
+    return {'id': user.id, 'username': user.username, 'token': issue_token(user)}
+
+
+def is_enrolled(user, course):
+    return course.students.filter(id=user.id).exists()
+
+
+def enroll(user, course):
+    course.students.add(user)
+    return {"enrolled": True}
+
+
+def course_progress(user, course):
+    """Прогресс пользователя по одному курсу."""
+    total_modules = course.modules.count()
+    return {
+        'course_id': course.id,
+        'course_title': course.title,
+        'last_module': CourseProgressTracker.get_last_module(user.id, course.id),
+        'completed_modules': list(
+            CourseProgressTracker.get_completed_modules(user.id, course.id)
+        ),
+        'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
+            user.id, course.id, total_modules
+        ),
+        'total_modules': total_modules,
+    }
+
+
+def all_progress(user):
+    """Прогресс пользователя по всем курсам, на которые он записан."""
+    progress_list = []
+    for course in Course.objects.filter(students=user):
+        total_modules = course.modules.count()
+        progress_list.append({
+            'course_id': course.id,
+            'course_title': course.title,
+            'progress_percentage': CourseProgressTracker.get_course_progress_percentage(
+                user.id, course.id, total_modules
+            ),
+            'last_module': CourseProgressTracker.get_last_module(user.id, course.id),
+            'completed_modules_count': len(
+                CourseProgressTracker.get_completed_modules(user.id, course.id)
+            ),
+            'total_modules': total_modules,
+        })
+    return {'courses': progress_list}
+
+
+def update_progress(user, course, module_id, completed):
+    """Отметить модуль пройденным или запомнить его как последний открытый."""
+    if completed:
+        CourseProgressTracker.mark_module_completed(
+            user.id, course.id, module_id, completed=True
+        )
+    else:
+        CourseProgressTracker.set_last_module(user.id, course.id, module_id)
+    return {
+        'status': 'success',
+        'course_id': course.id,
+        'module_id': module_id,
+        'completed': completed,
+    }
+
+
+def user_profile(user):
+    """Профиль пользователя со статистикой по курсам."""
+    from courses.api.serializers import UserSimpleSerializer
+
+    enrolled_courses = []
+    for course in Course.objects.filter(students=user):
+        enrolled_courses.append({
+            'id': course.id,
+            'title': course.title,
+            'progress': CourseProgressTracker.get_course_progress_percentage(
+                user.id, course.id, course.modules.count()
+            ),
+        })
+    total_progress = sum(course['progress'] for course in enrolled_courses)
+    avg_progress = total_progress / len(enrolled_courses) if enrolled_courses else 0
+
+    return {
+        'user': UserSimpleSerializer(user).data,
+        'statistics': {
+            'enrolled_courses': len(enrolled_courses),
+            'completed_courses': 0,  # Нужно добавить логику подсчета завершенных курсов
+            'average_progress': round(avg_progress, 2),
+            'total_courses_available': Course.objects.count(),
+        },
+        'enrolled_courses': enrolled_courses,
+    }
+
+
+def bot_home(user):
+    """
+    Всё для экранов бота одним ответом: курсы с прогрессом и последним
+    модулем, список желаемого и сводная статистика.
+
+    Два запроса к БД и один pipeline в Redis; результат кэшируется на
+    пользователя и сбрасывается сигналами при записи на курс, изменении
+    прогресса, списка желаемого и самих курсов.
+    """
+    key = bot_home_key(user.id)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    courses = list(
+        Course.objects.filter(students=user)
+        .select_related('subject')
+        .annotate(total_modules=Count('modules', distinct=True))
+    )
+    progress = CourseProgressTracker.get_progress_batch(
+        user.id, [course.id for course in courses]
+    )
+    wishlist = Wishlist.objects.filter(user=user).values_list('course_id', 'course__title')
+
+    course_rows = []
+    for course in courses:
+        completed, last_module = progress[course.id]
+        total = course.total_modules
+        course_rows.append({
+            'id': course.id,
+            'title': course.title,
+            'subject': course.subject.title,
+            'total_modules': total,
+            'completed_modules': len(completed),
+            'progress': int(len(completed) / total * 100) if total else 0,
+            'last_module': last_module,
+        })
+    average = sum(row['progress'] for row in course_rows) / len(course_rows) if course_rows else 0
+
+    payload = {
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+        },
+        'courses': course_rows,
+        'wishlist': [{'id': course_id, 'title': title} for course_id, title in wishlist],
+        'statistics': {
+            'enrolled_courses': len(course_rows),
+            'completed_courses': sum(1 for row in course_rows if row['progress'] == 100),
+            'average_progress': round(average, 2),
+        },
+    }
+    cache.set(key, payload, BOT_HOME_TTL)
+    return payload
+
+
+def module_contents_key(module_id):
+    return f"educa:module_contents:v2:{module_id}"
+
+
+def invalidate_module_contents(module_ids):
+    cache.delete_many([module_contents_key(module_id) for module_id in set(module_ids)])
+
+
+def _file_size(field):
+    try:
+        return field.size
+    except (OSError, ValueError):
+        # Файл удалён из хранилища
+        return None
+
+
+def _content_item(content):
+    """Элемент модуля без рендеринга шаблона: тип, заголовок, выдержка, ссылка."""
+    item = content.item
+    item_type = content.content_type.model
+    row = {
+        'id': content.id,
+        'order': content.order,
+        'type': item_type,
+        'title': item.title if item else '',
+        'excerpt': None,
+        'url': None,
+        'size': None,
+        'updated': item.updated.isoformat() if item else None,
+    }
+    if item is None:
+        return row
+    if item_type == 'text':
+        row['excerpt'] = Truncator(item.content).chars(EXCERPT_CHARS)
+    elif item_type == 'video':
+        row['url'] = item.url
+    elif item.file:
+        # MEDIA_URL относительный: клиентам (Telegram) нужна полная ссылка
+        row['url'] = urljoin(settings.SITE_URL.rstrip('/') + '/', item.file.url)
+        row['size'] = _file_size(item.file)
+    return row
+
+
+def module_contents(module):
+    """
+    Элементы одного модуля для бота и других лёгких клиентов.
+
+    ``version`` меняется при любом изменении элементов модуля, по нему
+    клиенты могут проверять свой кэш (ETag). Результат кэшируется на модуль.
+    """
+    key = module_contents_key(module.id)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    contents = (
+        Content.objects.filter(module=module)
+        .select_related('content_type')
+        .prefetch_related('item')
+    )
+    items = [_content_item(content) for content in contents]
+    version = hashlib.sha1(repr((
+        module.order,
+        module.title,
+        module.description,
+        [(item['id'], item['order'], item['updated']) for item in items],
+    )).encode()).hexdigest()[:16]
+    payload = {
+        'id': module.id,
+        'course_id': module.course_id,
+        'order': module.order,
+        'title': module.title,
+        'description': module.description,
+        'version': version,
+        'items': items,
+    }
+    cache.set(key, payload, MODULE_CONTENTS_TTL)
+    return payload
@@ -0,0 +1,117 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from utils.redis_utils import invalidate_bot_home
+
+from .membership import CourseMembership
+from .models import Content, Course, File, Image, Module, Text, Video, Wishlist
+from .services import invalidate_module_contents
+
+
+@receiver(m2m_changed, sender=Course.students.through)
+def sync_course_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the Redis membership sets in line with Course.students."""
+    if action == 'pre_clear':
+        # After the clear the other side of the relation is unknown
+        if reverse:
+            instance._cleared_course_ids = list(
+                instance.courses_joined.values_list('id', flat=True)
+            )
+        else:
+            instance._cleared_user_ids = list(
+                instance.students.values_list('id', flat=True)
+            )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_clear':
+        if reverse:
+            course_ids = getattr(instance, '_cleared_course_ids', [])
+            user_ids = [instance.pk]
+            action = 'post_remove'
+        else:
+            user_ids = getattr(instance, '_cleared_user_ids', [])
+
+            def reset():
+                CourseMembership.invalidate(instance.pk)
+                invalidate_bot_home(user_ids)
+            transaction.on_commit(reset)
+            return
+    elif reverse:
+        course_ids, user_ids = pk_set, [instance.pk]
+    else:
+        course_ids, user_ids = [instance.pk], pk_set
+
+    update = CourseMembership.add if action == 'post_add' else CourseMembership.remove
+
+    def apply():
+        for course_id in course_ids:
+            update(course_id, list(user_ids))
+        invalidate_bot_home(user_ids)
+
+    transaction.on_commit(apply)
+
+
+def invalidate_course_students(course_id):
+    """Titles and module counts are part of every student's bot home."""
+    user_ids = list(Course.students.through.objects.filter(
+        course_id=course_id
+    ).values_list('user_id', flat=True))
+    transaction.on_commit(lambda: invalidate_bot_home(user_ids))
+
+
+@receiver(pre_delete, sender=Course)
+def drop_course_bot_home(sender, instance, **kwargs):
+    # Enrolments go away with the course without m2m_changed
+    invalidate_course_students(instance.pk)
+
+
+@receiver(post_delete, sender=Course)
+def drop_course_membership(sender, instance, **kwargs):
+    CourseMembership.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Course)
+def course_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_course_students(instance.pk)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def module_changed(sender, instance, **kwargs):
+    invalidate_course_students(instance.course_id)
+    transaction.on_commit(lambda: invalidate_module_contents([instance.pk]))
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def content_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_module_contents([instance.module_id]))
+
+
+@receiver(post_save, sender=Text)
+@receiver(post_save, sender=Video)
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=Text)
+@receiver(post_delete, sender=Video)
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=File)
+def item_changed(sender, instance, **kwargs):
+    """An item can be edited without touching its Content row."""
+    module_ids = list(Content.objects.filter(
+        content_type=ContentType.objects.get_for_model(sender),
+        object_id=instance.pk,
+    ).values_list('module_id', flat=True))
+    if module_ids:
+        transaction.on_commit(lambda: invalidate_module_contents(module_ids))
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_bot_home([instance.user_id]))
@@ -4,6 +4,7 @@ from braces.views import CsrfExemptMixin, JsonRequestResponseMixin
 from django.apps import apps
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models import Count
 from django.forms.models import modelform_factory
 from django.shortcuts import get_object_or_404, redirect
@@ -17,6 +18,8 @@ from .forms import CourseForm, ModuleFormSet
 from .models import Wishlist
 from .forms import ModuleFormSet
 from .models import Content, Course, Module, Subject
+from .services import invalidate_module_contents
+from .signals import invalidate_course_students
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
@@ -151,17 +154,28 @@ class ModuleContentListView(TemplateResponseMixin, View):
 
 class ModuleOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
     def post(self, request):
-        for id, order in self.request_json.items():
-            Module.objects.filter(id=id, course__owner=request.user).update(order=order)
+        module_ids = [
+            id for id, order in self.request_json.items()
+            if Module.objects.filter(id=id, course__owner=request.user).update(order=order)
+        ]
+        # update() не шлёт сигналов: сбрасываем кэши так же, как post_save Module
+        course_ids = Module.objects.filter(id__in=module_ids).values_list('course_id', flat=True)
+        for course_id in set(course_ids):
+            invalidate_course_students(course_id)
+        transaction.on_commit(lambda: invalidate_module_contents(module_ids))
         return self.render_json_response({"saved": "OK"})
 
 
 class ContentOrderView(CsrfExemptMixin, JsonRequestResponseMixin, View):
     def post(self, request):
-        for id, order in self.request_json.items():
-            Content.objects.filter(id=id, module__course__owner=request.user).update(
+        content_ids = [
+            id for id, order in self.request_json.items()
+            if Content.objects.filter(id=id, module__course__owner=request.user).update(
                 order=order
             )
+        ]
+        module_ids = list(Content.objects.filter(id__in=content_ids).values_list('module_id', flat=True))
+        transaction.on_commit(lambda: invalidate_module_contents(module_ids))
         return self.render_json_response({"saved": "OK"})
 
 
@@ -176,7 +190,7 @@ class CourseListView(TemplateResponseMixin, View):
                 total_courses=Count('courses')
             )
             cache.set('all_subjects', subjects)
-        all_courses = Course.objects.annotate(
+        all_courses = Course.objects.defer('overview').annotate(
             total_modules=Count('modules')
         )
         if subject:
@@ -283,7 +297,11 @@ class WishlistListView(ListView):
     context_object_name = 'wishlist_items'
     
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user).select_related('course')
+        return (
+            Wishlist.objects.filter(user=self.request.user)
+            .select_related('course')
+            .defer('course__overview')
+        )
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -9,13 +9,30 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "educa.settings")
 
 django_asgi_app = get_asgi_application()
 
-from chat.routing import websocket_urlpatterns
+from chat.buffer import message_buffer
+from chat.routing import websocket_urlpatterns as chat_urlpatterns
+from students.routing import websocket_urlpatterns as progress_urlpatterns
+
+
+async def lifespan(scope, receive, send):
+    # Серверы с поддержкой lifespan дописывают буфер чата при остановке;
+    # для Daphne это делает atexit-обработчик буфера
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await message_buffer.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
 
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
+        "lifespan": lifespan,
         "websocket": AllowedHostsOriginValidator(
-            AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+            AuthMiddlewareStack(URLRouter(chat_urlpatterns + progress_urlpatterns))
         ),
     }
 )
@@ -104,10 +104,12 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379")
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
-        "LOCATION": os.getenv("REDIS_URL", "redis://127.0.0.1:6379"),
+        "LOCATION": REDIS_URL,
     }
 }
 
@@ -120,7 +122,19 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-    ]
+        'courses.api.authentication.SignedTokenAuthentication',
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        # Попытки входа через /api/auth/verify/ на один логин
+        "auth_verify": os.getenv("API_AUTH_VERIFY_RATE", "10/min"),
+    },
+}
+
+# /api/auth/verify/: срок жизни токена (сек) и сколько помнить неверную пару
+# логин/пароль, чтобы повторные попытки не проверяли хэш пароля заново
+API_AUTH = {
+    "TOKEN_MAX_AGE": int(os.getenv("API_TOKEN_MAX_AGE", str(30 * 24 * 3600))),
+    "FAILURE_CACHE_SECONDS": int(os.getenv("API_AUTH_FAILURE_CACHE_SECONDS", "300")),
 }
 
 TINYMCE_DEFAULT_CONFIG = {
@@ -136,7 +150,55 @@ CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
         "CONFIG": {
-            "hosts": [os.getenv("REDIS_URL", "redis://127.0.0.1:6379")],
+            "hosts": [REDIS_URL],
         },
     },
-}
\ No newline at end of file
+    # Pub/sub слой для больших комнат: одна публикация на процесс вместо
+    # копии сообщения в канал каждого участника
+    "fanout": {
+        "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
+        "CONFIG": {
+            "hosts": [REDIS_URL],
+        },
+    },
+}
+
+# Рассылка сообщений чата: слой каналов и окно склейки кадров (мс)
+CHAT_FANOUT = {
+    "LAYER": os.getenv("CHAT_CHANNEL_LAYER", "default"),
+    "COALESCE_MS": int(os.getenv("CHAT_COALESCE_MS", "5")),
+    "MAX_FRAMES": 50,
+}
+
+# Хранение чата: дней в основной таблице, дней в архиве (None - бессрочно)
+# и размер пачки compact_chat; для курса можно задать ChatRetention
+CHAT_RETENTION = {
+    "HOT_DAYS": int(os.getenv("CHAT_HOT_DAYS", "90")),
+    "ARCHIVE_DAYS": int(os.getenv("CHAT_ARCHIVE_DAYS")) if os.getenv("CHAT_ARCHIVE_DAYS") else None,
+    "BATCH_SIZE": 1000,
+}
+
+# Исходящая очередь каждого WebSocket-соединения чата:
+# политика переполнения - coalesce, drop_oldest или drop_newest
+CHAT_OUTBOUND = {
+    "MAX_QUEUE": int(os.getenv("CHAT_OUTBOUND_MAX_QUEUE", "100")),
+    "POLICY": os.getenv("CHAT_OUTBOUND_POLICY", "coalesce"),
+    "SLOW_DISCONNECT_SECONDS": float(os.getenv("CHAT_SLOW_DISCONNECT_SECONDS", "10")),
+}
+
+# Отслеживание последнего модуля: окно склейки записей и окно дедупликации (сек)
+LAST_MODULE_WRITE_WINDOW = float(os.getenv("LAST_MODULE_WRITE_WINDOW", "2"))
+LAST_MODULE_DEDUPE_SECONDS = float(os.getenv("LAST_MODULE_DEDUPE_SECONDS", "30"))
+
+# Буфер записи сообщений чата: пачка из MAX_BATCH сообщений или раз в MAX_DELAY_MS,
+# не больше MAX_PENDING сообщений в очереди процесса (дальше - backpressure).
+# SPILL_TO_REDIS дублирует сообщения в Redis stream до записи в БД.
+CHAT_WRITE_BUFFER = {
+    "MAX_BATCH": int(os.getenv("CHAT_BUFFER_MAX_BATCH", "100")),
+    "MAX_DELAY_MS": int(os.getenv("CHAT_BUFFER_MAX_DELAY_MS", "250")),
+    "MAX_PENDING": int(os.getenv("CHAT_BUFFER_MAX_PENDING", "5000")),
+    "SPILL_TO_REDIS": os.getenv("CHAT_BUFFER_SPILL", "1") == "1",
+}
+
+# Сколько последних сообщений курса хранить в Redis для быстрого открытия чата
+CHAT_HISTORY_DEPTH = int(os.getenv("CHAT_HISTORY_DEPTH", "50"))
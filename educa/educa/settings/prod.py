@@ -29,6 +29,7 @@ DATABASES = {
 REDIS_URL = "redis://cache:6379"
 CACHES["default"]["LOCATION"] = REDIS_URL
 CHANNEL_LAYERS["default"]["CONFIG"]["hosts"] = [REDIS_URL]
+CHANNEL_LAYERS["fanout"]["CONFIG"]["hosts"] = [REDIS_URL]
 
 # Telegram Bot настройки
 TELEGRAM_BOT_TOKEN = config("TELEGRAM_BOT_TOKEN", default="")
@@ -0,0 +1,29 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from utils.redis_utils import progress_group
+
+
+class ProgressConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live progress of the current user across all open tabs and devices.
+
+    CourseProgressTracker publishes compact deltas to the user's group:
+    ``{"type": "progress", "course": 1, "last_module": 5}`` or
+    ``{"type": "progress", "course": 1, "module": 5, "completed": true,
+    "completed_count": 3}``.
+    """
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+        self.group_name = progress_group(self.user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def progress_delta(self, event):
+        await self.send_json(event['delta'])
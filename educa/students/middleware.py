@@ -3,46 +3,51 @@ Middleware for tracking student course progress.
 """
 import logging
 
+from utils.redis_utils import CourseProgressTracker
+
 logger = logging.getLogger(__name__)
 
 
 class TrackStudentProgressMiddleware:
     """
     Automatically track when students access course modules.
+
+    Views record the module that was actually shown in
+    ``request.last_module_access`` as ``(course_id, module_id)``. The write
+    itself is deferred until the response has been sent to the client and
+    goes through the coalescing buffer of ``CourseProgressTracker``.
     """
     def __init__(self, get_response):
         self.get_response = get_response
-    
+
     def __call__(self, request):
         response = self.get_response(request)
-        
+
         # Track module access
-        if request.user.is_authenticated:
-            self._track_module_access(request)
-        
+        access = getattr(request, 'last_module_access', None)
+        if access and request.user.is_authenticated and response.status_code < 400:
+            self._defer_module_access(request.user.id, access, response)
+
         return response
-    
-    def _track_module_access(self, request):
-        """Track module access if applicable."""
-        try:
-            # Check if we're on a course module page
-            resolver_match = request.resolver_match
-            if not resolver_match:
-                return
-            
-            url_name = resolver_match.url_name
-            
-            if url_name == 'student_course_detail_module':
-                course_id = resolver_match.kwargs.get('pk')
-                module_id = resolver_match.kwargs.get('module_id')
-                
-                if course_id and module_id:
-                    from utils.redis_utils import CourseProgressTracker
-                    CourseProgressTracker.set_last_module(
-                        request.user.id,
-                        course_id,
-                        module_id
-                    )
-                    
-        except Exception as e:
-            logger.error(f"Progress tracking error: {e}")
\ No newline at end of file
+
+    def _defer_module_access(self, user_id, access, response):
+        """Schedule the write to run once the response is closed."""
+        course_id, module_id = access
+
+        def track():
+            try:
+                CourseProgressTracker.touch_last_module(user_id, course_id, module_id)
+            except Exception as e:
+                logger.error(f"Progress tracking error: {e}")
+
+        # WSGI и ASGI обработчики вызывают response.close() после отправки
+        # ответа клиенту - пишем прогресс после него
+        close = response.close
+
+        def close_and_track():
+            try:
+                close()
+            finally:
+                track()
+
+        response.close = close_and_track
@@ -0,0 +1,8 @@
+from django.urls import re_path
+
+from . import consumers
+
+
+websocket_urlpatterns = [
+    re_path(r'ws/progress/$', consumers.ProgressConsumer.as_asgi()),
+]
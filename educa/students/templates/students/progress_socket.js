@@ -0,0 +1,28 @@
+// Живые обновления прогресса: дельты из ws/progress/ вместо опроса/перезагрузки
+function connectProgressSocket(onDelta) {
+    const url = 'wss://' + window.location.host + '/ws/progress/';
+    let retryDelay = 1000;
+
+    function connect() {
+        const socket = new WebSocket(url);
+        socket.onopen = function() {
+            retryDelay = 1000;
+        };
+        socket.onmessage = function(e) {
+            try {
+                const delta = JSON.parse(e.data);
+                if (delta.type === 'progress') {
+                    onDelta(delta);
+                }
+            } catch (error) {
+                console.error('Error processing progress update:', error);
+            }
+        };
+        socket.onclose = function() {
+            setTimeout(connect, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    }
+
+    connect();
+}
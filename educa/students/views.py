@@ -58,7 +58,7 @@ class StudentCourseListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(students__in=[self.request.user])
+        return qs.filter(students__in=[self.request.user]).defer('overview')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -130,12 +130,8 @@ class StudentCourseDetailView(LoginRequiredMixin, DetailView):
                 id=self.kwargs['module_id']
             )
             
-            # Track this module access
-            CourseProgressTracker.set_last_module(
-                self.request.user.id,
-                course.id,
-                module.id
-            )
+            # Track this module access (written by the middleware)
+            self.request.last_module_access = (course.id, module.id)
             
             return module
         
@@ -158,11 +154,7 @@ class StudentCourseDetailView(LoginRequiredMixin, DetailView):
             first_module = course.modules.first()
             
             # Initialize tracking
-            CourseProgressTracker.set_last_module(
-                self.request.user.id,
-                course.id,
-                first_module.id
-            )
+            self.request.last_module_access = (course.id, first_module.id)
             
             return first_module
         
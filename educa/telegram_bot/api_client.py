@@ -1,85 +1,116 @@
-import aiohttp
-import base64
 import logging
-from typing import Optional, Tuple, Dict, Any, List
-from aiohttp import ClientTimeout
+import time
+from typing import Optional, Tuple, Dict, Any, List, Callable
+
+from .cache import ResponseCache, cache_ttl, namespace_for
+from .transports import HTTPTransport, create_transport
 
 logger = logging.getLogger(__name__)
 
+
 class EducaAPIClient:
-    def __init__(self, base_url: str):
+    """
+    Клиент Educa API для бота.
+
+    Запросы выполняет транспорт: HTTPTransport (REST API по сети, по
+    умолчанию) или InProcessTransport (сервисные функции Django прямо в
+    процессе бота). Методы клиента от транспорта не зависят.
+    
+    GET-ответы кэшируются в ResponseCache (если он передан), запись на курс
+    и обновление прогресса сбрасывают кэш пользователя.
+    
+    ``hooks`` - функции hook(endpoint, method, duration_ms, ok), которые
+    вызываются после каждого запроса (метрики).
+    """
+    def __init__(self, base_url: Optional[str] = None, transport=None,
+                 cache: Optional[ResponseCache] = None):
         self.base_url = base_url
-        
-    def _create_auth_headers(self, auth: Optional[Tuple[str, str]] = None) -> Dict:
-        """Создает заголовки с Basic Auth"""
-        headers = {
-            'User-Agent': 'TelegramBot/1.0',
-            'Accept': 'application/json',
-        }
-        
-        if auth and len(auth) == 2:
-            username, password = auth
-            credentials = f"{username}:{password}"
-            encoded = base64.b64encode(credentials.encode()).decode()
-            headers['Authorization'] = f'Basic {encoded}'
-            
-        return headers
+        self.transport = transport or HTTPTransport(base_url)
+        self.cache = cache
+        self.hooks: List[Callable[[str, str, float, bool], None]] = []
+    
+    async def close(self):
+        """Закрыть транспорт (при остановке бота)"""
+        await self.transport.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    def connection_stats(self) -> Dict:
+        """Метрики пула соединений (только для HTTP транспорта)"""
+        stats = getattr(self.transport, 'connection_stats', None)
+        return stats() if stats else {}
+    
+    def cache_stats(self) -> Dict:
+        """Попадания/промахи кэша ответов"""
+        return self.cache.report() if self.cache else {}
+    
+    def invalidate_user(self, auth: Tuple[str, str]):
+        """Сбросить закэшированные ответы пользователя"""
+        if self.cache:
+            self.cache.invalidate(namespace_for(auth))
     
     async def _make_request(self, endpoint: str, method: str = "GET", 
-                           auth: Optional[Tuple[str, str]] = None, **kwargs) -> Any:
+                           auth: Optional[Tuple[str, str]] = None,
+                           timeout: Optional[str] = None,
+                           use_cache: bool = True, **kwargs) -> Any:
         """Универсальный метод для запросов"""
-        url = f"{self.base_url}/{endpoint.lstrip('/')}"
-        headers = self._create_auth_headers(auth)
-        
-        # Обновляем заголовки из kwargs
-        if 'headers' in kwargs:
-            headers.update(kwargs.pop('headers'))
+        started = time.perf_counter()
+        result = await self._request(endpoint, method, auth, timeout, use_cache, **kwargs)
+        if self.hooks:
+            duration = (time.perf_counter() - started) * 1000
+            ok = not (isinstance(result, dict) and "error" in result)
+            for hook in self.hooks:
+                hook(endpoint, method, duration, ok)
+        return result
+    
+    async def _request(self, endpoint, method, auth, timeout, use_cache, **kwargs) -> Any:
+        def load():
+            return self.transport.request(
+                endpoint, method=method, auth=auth, timeout=timeout, **kwargs
+            )
         
-        try:
-            async with aiohttp.ClientSession(timeout=ClientTimeout(total=30)) as session:
-                async with session.request(
-                    method=method,
-                    url=url,
-                    headers=headers,
-                    **kwargs
-                ) as response:
-                    
-                    logger.info(f"API Request: {method} {url} -> {response.status}")
-                    
-                    if response.status == 200:
-                        return await response.json()
-                    elif response.status == 201:
-                        return await response.json()
-                    else:
-                        try:
-                            error_data = await response.json()
-                            return {"error": error_data, "status_code": response.status}
-                        except:
-                            error_text = await response.text()
-                            return {"error": f"HTTP {response.status}: {error_text[:200]}", 
-                                   "status_code": response.status}
-                            
-        except Exception as e:
-            logger.error(f"API Error: {e}")
-            return {"error": str(e), "status_code": 0}
+        ttl = cache_ttl(endpoint) if method == "GET" and use_cache and self.cache else None
+        if ttl is None:
+            return await load()
+        # Ошибки не кэшируем, чтобы следующий запрос попробовал снова
+        return await self.cache.fetch(
+            namespace_for(auth), endpoint, ttl, load,
+            cacheable=lambda result: not (isinstance(result, dict) and "error" in result),
+        )
     
     # ========== Аутентификация ==========
     
     async def check_auth(self, username: str, password: str) -> Dict:
-        """Проверка аутентификации"""
+        """Проверка логина и пароля (auth/verify/, без загрузки курсов)"""
         try:
-            result = await self._make_request("courses/", auth=(username, password))
+            result = await self._make_request(
+                "auth/verify/", method="POST", auth=(username, password),
+                timeout='auth', use_cache=False
+            )
             
             if isinstance(result, dict) and "error" in result:
+                status_code = result.get("status_code", 401)
+                if status_code == 429:
+                    error = "Слишком много попыток входа, попробуйте позже"
+                elif status_code == 401:
+                    error = "Неверный логин или пароль"
+                else:
+                    error = result.get("error")
                 return {
                     "success": False,
-                    "error": result.get("error"),
-                    "status_code": result.get("status_code", 401)
+                    "error": error,
+                    "status_code": status_code
                 }
             
             return {
                 "success": True,
+                "user_id": result.get("id"),
                 "username": username,
+                "token": result.get("token"),
                 "auth": (username, password)
             }
             
@@ -98,6 +129,17 @@ class EducaAPIClient:
             
         return result.get("results", [])
     
+    async def get_courses_page(self, auth: Tuple[str, str], page: int,
+                               page_size: int) -> Optional[Dict]:
+        """Страница каталога целиком: count, next, previous, results"""
+        result = await self._make_request(f"courses/?page={page}&page_size={page_size}", auth=auth)
+        
+        if isinstance(result, dict) and "error" in result:
+            logger.error(f"Error getting courses page {page}: {result.get('error')}")
+            return None
+            
+        return result
+    
     async def get_course_detail(self, course_id: int, auth: Tuple[str, str]) -> Optional[Dict]:
         """Детали курса"""
         result = await self._make_request(f"courses/{course_id}/", auth=auth)
@@ -108,6 +150,21 @@ class EducaAPIClient:
             
         return result
     
+    async def get_courses_by_ids(self, course_ids: List[int], auth: Tuple[str, str]) -> Optional[List[Dict]]:
+        """Несколько курсов одним запросом (?ids=...); None - если запрос не удался"""
+        if not course_ids:
+            return []
+        ids = ",".join(str(course_id) for course_id in course_ids)
+        result = await self._make_request(
+            f"courses/?ids={ids}&page_size={len(course_ids)}", auth=auth
+        )
+        
+        if isinstance(result, dict) and "error" in result:
+            logger.error(f"Error getting courses {ids}: {result.get('error')}")
+            return None
+            
+        return result.get("results", [])
+    
     async def get_course_contents(self, course_id: int, auth: Tuple[str, str]) -> List[Dict]:
         """Содержимое курса"""
         result = await self._make_request(f"courses/{course_id}/contents/", auth=auth)
@@ -118,6 +175,19 @@ class EducaAPIClient:
             
         return result.get("modules", []) if isinstance(result, dict) else result
     
+    async def get_module_contents(self, course_id: int, module_id: int,
+                                  auth: Tuple[str, str]) -> Optional[Dict]:
+        """Элементы одного модуля (тип, заголовок, выдержка, ссылка, размер)"""
+        result = await self._make_request(
+            f"courses/{course_id}/modules/{module_id}/contents/", auth=auth
+        )
+        
+        if isinstance(result, dict) and "error" in result:
+            logger.error(f"Error getting contents for module {module_id}: {result.get('error')}")
+            return None
+            
+        return result
+    
     async def enroll_to_course(self, course_id: int, auth: Tuple[str, str]) -> bool:
         """Записаться на курс"""
         result = await self._make_request(
@@ -129,7 +199,8 @@ class EducaAPIClient:
         if isinstance(result, dict) and "error" in result:
             logger.error(f"Error enrolling to course {course_id}: {result.get('error')}")
             return False
-            
+        
+        self.invalidate_user(auth)
         return True
     
     async def get_enrolled_courses(self, auth: Tuple[str, str]) -> List[Dict]:
@@ -182,7 +253,8 @@ class EducaAPIClient:
         if isinstance(result, dict) and "error" in result:
             logger.error(f"Error updating progress: {result.get('error')}")
             return False
-            
+        
+        self.invalidate_user(auth)
         return True
     
     # ========== Профиль пользователя ==========
@@ -197,6 +269,16 @@ class EducaAPIClient:
             
         return result
     
+    async def get_home(self, auth: Tuple[str, str]) -> Optional[Dict]:
+        """Курсы с прогрессом, желаемое и статистика одним запросом (bot/home/)"""
+        result = await self._make_request("bot/home/", auth=auth)
+        
+        if isinstance(result, dict) and "error" in result:
+            logger.error(f"Error getting bot home: {result.get('error')}")
+            return None
+            
+        return result
+    
     # ========== Гостевой режим ==========
     
     async def get_guest_courses(self) -> List[Dict]:
@@ -212,9 +294,17 @@ class EducaAPIClient:
 # Синглтон
 api_client = None
 
+def create_api_client():
+    """Клиент с транспортом из настроек бота (BOT_API_TRANSPORT)"""
+    from .config import config
+    return EducaAPIClient(
+        config.API_BASE_URL,
+        transport=create_transport(config.API_TRANSPORT, config.API_BASE_URL),
+        cache=ResponseCache(config.API_CACHE_SIZE) if config.API_CACHE_SIZE else None,
+    )
+
 def get_api_client():
     global api_client
     if api_client is None:
-        from .config import config
-        api_client = EducaAPIClient(config.API_BASE_URL)
+        api_client = create_api_client()
     return api_client
\ No newline at end of file
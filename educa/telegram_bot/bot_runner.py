@@ -6,22 +6,34 @@ import asyncio
 import logging
 import os
 import sys
+from typing import Optional
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
 from aiogram.types import (
     Message, ReplyKeyboardMarkup, KeyboardButton,
     InlineKeyboardMarkup, InlineKeyboardButton,
     CallbackQuery
 )
-from aiogram import Bot, Dispatcher, F
+from aiogram import Dispatcher, F
 from aiogram.filters import CommandStart, Command
+import redis.asyncio as aioredis
+from aiohttp import web
 
 # Импортируем наши модули
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from telegram_bot.config import config
-from telegram_bot.api_client import EducaAPIClient
+from telegram_bot.config import config, create_bot
+from telegram_bot.api_client import create_api_client
+from telegram_bot.catalog import CatalogPages
+from telegram_bot.fanout import fan_out
+from telegram_bot.leader import LeaderLease, run_as_leader
+from telegram_bot.metrics import (
+    BotMetrics, HandlerMetricsMiddleware, TelegramRequestMetrics, create_metrics_app, status_text,
+)
+from telegram_bot.scheduler import OrderedUpdatesMiddleware, UpdateScheduler
+from telegram_bot.sessions import SessionStore, make_cipher
+from telegram_bot.webhook import create_webhook_app, run_webhook
 
 # Настройка логирования
 logging.basicConfig(
@@ -36,12 +48,42 @@ if not TELEGRAM_TOKEN:
     logger.error("❌ TELEGRAM_BOT_TOKEN не найден!")
     sys.exit(1)
 
-bot = Bot(token=TELEGRAM_TOKEN)
-storage = MemoryStorage()
+bot = create_bot()
+# FSM и сессии в Redis: общие для всех процессов бота и переживают перезапуск
+redis = aioredis.from_url(config.REDIS_URL)
+storage = RedisStorage(redis, state_ttl=config.FSM_TTL, data_ttl=config.FSM_TTL)
 dp = Dispatcher(storage=storage)
 
+# Обновления одного пользователя - по порядку, разных - параллельно
+scheduler = UpdateScheduler(
+    concurrency=config.UPDATE_CONCURRENCY,
+    timeout=config.HANDLER_TIMEOUT,
+    max_pending=config.MAX_PENDING_UPDATES,
+    max_per_user=config.MAX_USER_UPDATES,
+)
+# В polling переполненная очередь тормозит опрос, в webhook - ответ 503
+dp.update.outer_middleware(
+    OrderedUpdatesMiddleware(scheduler, wait_capacity=config.MODE != 'webhook')
+)
+
+if not config.SESSION_SECRET:
+    logger.warning("⚠️ BOT_SESSION_KEY не задан, ключ шифрования сессий получен из токена бота")
+sessions = SessionStore(
+    redis, make_cipher(config.SESSION_SECRET or TELEGRAM_TOKEN), ttl=config.SESSION_TTL
+)
+
 # Инициализация API клиента
-api_client = EducaAPIClient(config.API_BASE_URL)
+api_client = create_api_client()
+
+# Метрики: время хэндлеров, запросов к API и к Telegram (/status, /metrics)
+metrics = BotMetrics()
+dp.message.middleware(HandlerMetricsMiddleware(metrics))
+dp.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+bot.session.middleware(TelegramRequestMetrics(metrics))
+api_client.hooks.append(metrics.observe_api)
+metrics.collectors['updates'] = scheduler.stats
+metrics.collectors['api_cache'] = api_client.cache_stats
+metrics.collectors['api_http'] = api_client.connection_stats
 
 # Состояния FSM
 class AuthState(StatesGroup):
@@ -53,10 +95,6 @@ class CourseState(StatesGroup):
     viewing_course = State()
     viewing_module = State()
 
-# Хранилище сессий
-user_sessions = {}
-user_states = {}  # Для хранения временных данных
-
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
 
 def get_main_keyboard(is_auth: bool = False):
@@ -119,6 +157,25 @@ def create_courses_keyboard(courses: list, page: int, total_pages: int,
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+def render_catalog_page(courses: list, page: int, total_pages: int):
+    """Текст и клавиатура страницы каталога (кэшируются в CatalogPages)"""
+    if not courses:
+        return "📭 Курсы не найдены.", create_courses_keyboard([], page, total_pages)
+    
+    first = (page - 1) * config.MAX_COURSES_PER_PAGE
+    response = "📚 *Все курсы:*\n\n"
+    for i, course in enumerate(courses, first + 1):
+        title = course.get('title', 'Без названия')
+        overview = course.get('overview_excerpt', '')[:50]
+        response += f"{i}. *{title}*\n   {overview}...\n\n"
+    
+    keyboard = create_courses_keyboard(courses, page=page, total_pages=total_pages, prefix="course")
+    return response, keyboard
+
+# Страницы каталога с предзагрузкой следующей (см. telegram_bot.catalog)
+catalog = CatalogPages(api_client, render_catalog_page, config.MAX_COURSES_PER_PAGE)
+metrics.collectors['catalog'] = catalog.report
+
 def create_course_detail_keyboard(course_id: int, is_enrolled: bool = False, 
                                  is_favorite: bool = False) -> InlineKeyboardMarkup:
     """Клавиатура для деталей курса"""
@@ -161,9 +218,11 @@ def create_course_detail_keyboard(course_id: int, is_enrolled: bool = False,
 async def start_cmd(message: Message):
     """Начало работы"""
     user_id = message.from_user.id
+    await sessions.remember_chat(message.chat.id)
     
-    if user_id in user_sessions:
-        username = user_sessions[user_id]["username"]
+    session = await sessions.get(user_id)
+    if session:
+        username = session["username"]
         await message.answer(
             f"🎓 *С возвращением, {username}!*\n\n"
             "Выберите раздел:",
@@ -187,7 +246,7 @@ async def start_cmd(message: Message):
 async def help_cmd(message: Message):
     """Помощь"""
     user_id = message.from_user.id
-    is_auth = user_id in user_sessions
+    is_auth = await sessions.exists(user_id)
     
     help_text = "🤖 *Educa Bot - Помощь*\n\n"
     
@@ -213,6 +272,15 @@ async def help_cmd(message: Message):
     
     await message.answer(help_text, parse_mode="Markdown")
 
+@dp.message(Command("status"))
+async def status_cmd(message: Message):
+    """Статус бота; подробные метрики - только администраторам"""
+    if message.from_user.id not in config.ADMIN_IDS:
+        await message.answer("✅ Бот работает")
+        return
+    
+    await message.answer(status_text(metrics))
+
 # ========== АВТОРИЗАЦИЯ ==========
 
 @dp.message(F.text == "🔐 Войти")
@@ -221,7 +289,7 @@ async def login_cmd(message: Message, state: FSMContext):
     """Вход в систему"""
     user_id = message.from_user.id
     
-    if user_id in user_sessions:
+    if await sessions.exists(user_id):
         await message.answer("✅ Вы уже авторизованы!")
         return
     
@@ -254,12 +322,7 @@ async def process_password(message: Message, state: FSMContext):
     result = await api_client.check_auth(username, password)
     
     if result.get("success"):
-        user_sessions[user_id] = {
-            "username": username,
-            "auth": (username, password),
-            "authenticated": True,
-            "favorites": []  # Для хранения избранных курсов
-        }
+        await sessions.create(user_id, username, password)
         
         await message.answer(
             f"✅ *Авторизация успешна!*\n\n"
@@ -283,9 +346,10 @@ async def logout_cmd(message: Message):
     """Выход из системы"""
     user_id = message.from_user.id
     
-    if user_id in user_sessions:
-        username = user_sessions[user_id]["username"]
-        del user_sessions[user_id]
+    session = await sessions.get(user_id)
+    if session:
+        username = session["username"]
+        await sessions.delete(user_id)
         await message.answer(
             f"👋 До свидания, {username}!\nВы вышли из системы.",
             reply_markup=get_main_keyboard(is_auth=False)
@@ -300,7 +364,8 @@ async def all_courses_cmd(message: Message):
     """Все курсы"""
     user_id = message.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await message.answer(
             "Для просмотра курсов необходимо авторизоваться.\n\n"
             "Нажмите '🔐 Войти'",
@@ -308,62 +373,117 @@ async def all_courses_cmd(message: Message):
         )
         return
     
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await message.answer("📚 Загружаю список курсов...")
     
     try:
-        courses = await api_client.get_all_courses(auth, page=1)
+        page = await catalog.get(auth, 1)
         
-        if not courses:
-            await message.answer("📭 Курсы не найдены.")
+        if page is None:
+            await message.answer("❌ Не удалось загрузить курсы.")
             return
         
-        # Сохраняем курсы во временное состояние
-        user_states[user_id] = {
-            "courses": courses,
-            "current_page": 1,
-            "total_pages": 5,  # Нужно получать из API
-            "view_type": "all"
-        }
-        
-        # Формируем сообщение
-        response = "📚 *Все курсы:*\n\n"
-        for i, course in enumerate(courses[:config.MAX_COURSES_PER_PAGE], 1):
-            title = course.get('title', 'Без названия')
-            overview = course.get('overview', '')[:50]
-            response += f"{i}. *{title}*\n   {overview}...\n\n"
-        
-        # Создаем клавиатуру
-        keyboard = create_courses_keyboard(
-            courses[:config.MAX_COURSES_PER_PAGE],
-            page=1,
-            total_pages=5,
-            prefix="course"
-        )
-        
-        await message.answer(response, parse_mode="Markdown", reply_markup=keyboard)
+        await sessions.set_view(user_id, "all", page=1, total_pages=page.total_pages)
+        await message.answer(page.text, parse_mode="Markdown", reply_markup=page.keyboard)
+        catalog.prefetch(auth, 2, page.total_pages)
         
     except Exception as e:
         logger.error(f"Error in all_courses_cmd: {e}")
         await message.answer("❌ Не удалось загрузить курсы.")
 
+async def show_catalog_page(callback: CallbackQuery, page_number: int):
+    """Открыть страницу каталога в том же сообщении"""
+    user_id = callback.from_user.id
+    
+    session = await sessions.get(user_id)
+    if not session:
+        await callback.answer("Сначала войдите в систему", show_alert=True)
+        return
+    
+    auth = session["auth"]
+    page = await catalog.get(auth, page_number)
+    
+    if page is None:
+        await callback.answer("❌ Страница недоступна", show_alert=True)
+        return
+    
+    await sessions.set_view(user_id, "all", page=page_number, total_pages=page.total_pages)
+    await callback.message.edit_text(page.text, parse_mode="Markdown", reply_markup=page.keyboard)
+    await callback.answer()
+    catalog.prefetch(auth, page_number + 1, page.total_pages)
+
+@dp.callback_query(F.data.startswith("page_"))
+async def change_page(callback: CallbackQuery):
+    """Листание каталога"""
+    try:
+        await show_catalog_page(callback, int(callback.data.split("_")[1]))
+    except Exception as e:
+        logger.error(f"Error changing page: {e}")
+        await callback.answer("❌ Не удалось загрузить страницу", show_alert=True)
+
+@dp.callback_query(F.data == "current")
+async def current_page(callback: CallbackQuery):
+    """Кнопка с номером страницы ничего не делает"""
+    await callback.answer()
+
+async def load_progress_by_course(auth, course_ids):
+    """{course_id: прогресс}: один запрос progress/, при ошибке - fan_out"""
+    progress_data = await api_client.get_all_progress(auth)
+    if progress_data and 'courses' in progress_data:
+        return {item['course_id']: item for item in progress_data['courses']}
+    results = await fan_out(
+        course_ids, lambda course_id: api_client.get_course_progress(course_id, auth)
+    )
+    return {
+        course_id: progress
+        for course_id, progress in zip(course_ids, results) if progress
+    }
+
+async def load_courses(auth, course_ids):
+    """Курсы по id в исходном порядке: один запрос ?ids=, при ошибке - fan_out"""
+    courses = await api_client.get_courses_by_ids(course_ids, auth)
+    if courses is None:
+        courses = await fan_out(
+            course_ids, lambda course_id: api_client.get_course_detail(course_id, auth)
+        )
+    by_id = {course['id']: course for course in courses if course}
+    # Удалённые курсы просто пропускаем
+    return [by_id[course_id] for course_id in course_ids if course_id in by_id]
+
+async def load_my_courses(auth):
+    """
+    Курсы пользователя и {course_id: прогресс}: один запрос bot/home/,
+    если он недоступен - my-courses/ и прогресс отдельно
+    """
+    home = await api_client.get_home(auth)
+    if home is not None:
+        return home['courses'], {
+            course['id']: {'progress_percentage': course['progress']}
+            for course in home['courses']
+        }
+    courses = await api_client.get_enrolled_courses(auth)
+    if not courses:
+        return [], {}
+    return courses, await load_progress_by_course(auth, [course['id'] for course in courses])
+
 @dp.message(F.text == "🎓 Мои курсы")
 async def my_courses_cmd(message: Message):
     """Мои курсы"""
     user_id = message.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await message.answer("Сначала войдите: /login")
         return
     
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await message.answer("🎓 Загружаю ваши курсы...")
     
     try:
-        # Получаем курсы пользователя
-        courses = await api_client.get_enrolled_courses(auth)
+        # Курсы пользователя и прогресс по ним
+        courses, progress_by_course = await load_my_courses(auth)
         
         if not courses:
             await message.answer(
@@ -373,19 +493,12 @@ async def my_courses_cmd(message: Message):
             return
         
         # Сохраняем во временное состояние
-        user_states[user_id] = {
-            "courses": courses,
-            "current_page": 1,
-            "total_pages": 1,
-            "view_type": "my"
-        }
+        await sessions.set_view(user_id, "my", page=1, total_pages=1)
         
         response = "🎓 *Ваши курсы:*\n\n"
         for i, course in enumerate(courses, 1):
             title = course.get('title', 'Без названия')
-            
-            # Получаем прогресс
-            progress = await api_client.get_course_progress(course['id'], auth)
+            progress = progress_by_course.get(course['id'])
             progress_percent = progress.get('progress_percentage', 0) if progress else 0
             
             response += f"{i}. *{title}*\n"
@@ -409,16 +522,17 @@ async def favorites_cmd(message: Message):
     """Избранные курсы"""
     user_id = message.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await message.answer("Сначала войдите: /login")
         return
     
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await message.answer("⭐ Загружаю избранные курсы...")
     
     try:
-        favorites = user_sessions[user_id].get("favorites", [])
+        favorites = session["favorites"]
         
         if not favorites:
             await message.answer(
@@ -428,11 +542,7 @@ async def favorites_cmd(message: Message):
             return
         
         # Получаем детали избранных курсов
-        courses = []
-        for course_id in favorites:
-            course = await api_client.get_course_detail(course_id, auth)
-            if course:
-                courses.append(course)
+        courses = await load_courses(auth, favorites)
         
         response = "⭐ *Избранные курсы:*\n\n"
         for i, course in enumerate(courses, 1):
@@ -461,7 +571,8 @@ async def show_course_detail(callback: CallbackQuery):
     """Показать детали курса"""
     user_id = callback.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await callback.answer("Сначала войдите в систему", show_alert=True)
         return
     
@@ -476,8 +587,8 @@ async def show_course_detail(callback: CallbackQuery):
         course_id = int(callback.data.split("_")[1])
         view_type = "favorites"
     
-    auth = user_sessions[user_id]["auth"]
-    favorites = user_sessions[user_id].get("favorites", [])
+    auth = session["auth"]
+    favorites = session["favorites"]
     
     await callback.message.edit_text("📘 Загружаю информацию о курсе...")
     
@@ -492,7 +603,7 @@ async def show_course_detail(callback: CallbackQuery):
         
         # Формируем описание
         title = course.get('title', 'Без названия')
-        overview = course.get('overview', 'Нет описания')
+        overview = course.get('overview_excerpt') or 'Нет описания'
         subject = course.get('subject', {}).get('title', 'Не указано')
         created = course.get('created', '')[:10]
         modules_count = len(course.get('modules', []))
@@ -544,12 +655,13 @@ async def enroll_to_course(callback: CallbackQuery):
     """Записаться на курс"""
     user_id = callback.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await callback.answer("Сначала войдите в систему", show_alert=True)
         return
     
     course_id = int(callback.data.split("_")[1])
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await callback.message.edit_text("🎓 Записываю на курс...")
     
@@ -578,91 +690,137 @@ async def enroll_to_course(callback: CallbackQuery):
 
 @dp.callback_query(F.data.startswith("contents_"))
 async def show_course_contents(callback: CallbackQuery):
-    """Показать содержимое курса"""
+    """Показать модули курса (содержимое модуля загружается при выборе)"""
     user_id = callback.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await callback.answer("Сначала войдите в систему", show_alert=True)
         return
     
     course_id = int(callback.data.split("_")[1])
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await callback.message.edit_text("📖 Загружаю материалы курса...")
     
     try:
-        contents = await api_client.get_course_contents(course_id, auth)
+        course = await api_client.get_course_detail(course_id, auth)
+        modules = course.get('modules', []) if course else []
         
-        if not contents:
+        if not modules:
             await callback.message.edit_text("📭 Материалы курса не найдены.")
             await callback.answer()
             return
         
-        response = "📖 *Материалы курса:*\n\n"
+        response = f"📖 *Материалы курса {course.get('title', '')}*\n\nВыберите модуль:"
         
-        for module in contents:
-            module_title = module.get('title', 'Без названия')
-            module_order = module.get('order', 0)
-            contents_list = module.get('contents', [])
-            
-            response += f"📦 *Модуль {module_order}: {module_title}*\n"
-            
-            for content in contents_list:
-                content_order = content.get('order', 0)
-                item = content.get('item', {})
-                item_type = item.get('type', 'material')
-                item_title = item.get('title', 'Материал')
-                
-                icon = "📄" if item_type == "text" else "🎥" if item_type == "video" else "📎"
-                response += f"   {icon} {content_order}. {item_title}\n"
-            
+        keyboard = [
+            [InlineKeyboardButton(
+                text=f"📦 {module.get('order', 0)}. {module.get('title', 'Без названия')}"[:60],
+                callback_data=f"cmodule_{course_id}_{module['id']}"
+            )]
+            for module in modules
+        ]
+        keyboard.append([
+            InlineKeyboardButton(text="⬅️ К курсу", callback_data=f"course_{course_id}"),
+            InlineKeyboardButton(text="🏠 В меню", callback_data="main_menu")
+        ])
+        
+        await callback.message.edit_text(
+            response,
+            parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+        )
+        await callback.answer()
+        
+    except Exception as e:
+        logger.error(f"Error showing contents: {e}")
+        await callback.message.edit_text("❌ Не удалось загрузить материалы.")
+        await callback.answer()
+
+def format_size(size: Optional[int]) -> str:
+    if not size:
+        return ""
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f" ({size:.0f} {unit})"
+        size /= 1024
+    return f" ({size:.1f} ГБ)"
+
+@dp.callback_query(F.data.startswith("cmodule_"))
+async def show_module_contents(callback: CallbackQuery):
+    """Показать элементы одного модуля"""
+    user_id = callback.from_user.id
+    
+    session = await sessions.get(user_id)
+    if not session:
+        await callback.answer("Сначала войдите в систему", show_alert=True)
+        return
+    
+    _, course_id, module_id = callback.data.split("_")
+    course_id, module_id = int(course_id), int(module_id)
+    
+    try:
+        module = await api_client.get_module_contents(course_id, module_id, session["auth"])
+        
+        if module is None:
+            await callback.answer("❌ Не удалось загрузить модуль", show_alert=True)
+            return
+        
+        # Без разметки: в выдержках и ссылках бывают * и _
+        response = f"📦 Модуль {module['order']}: {module['title']}\n\n"
+        if module.get('description'):
+            response += f"{module['description']}\n\n"
+        if not module['items']:
+            response += "📭 В модуле пока нет материалов."
+        
+        for item in module['items']:
+            icon = {"text": "📄", "video": "🎥", "image": "🖼"}.get(item['type'], "📎")
+            response += f"{icon} {item['title']}{format_size(item.get('size'))}\n"
+            if item.get('excerpt'):
+                response += f"{item['excerpt']}\n"
+            if item.get('url'):
+                response += f"{item['url']}\n"
             response += "\n"
         
-        # Кнопка назад
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
                 [
-                    InlineKeyboardButton(text="⬅️ К курсу", callback_data=f"course_{course_id}"),
+                    InlineKeyboardButton(text="⬅️ К модулям", callback_data=f"contents_{course_id}"),
                     InlineKeyboardButton(text="🏠 В меню", callback_data="main_menu")
                 ]
             ]
         )
         
         await callback.message.edit_text(
-            response,
-            parse_mode="Markdown",
-            reply_markup=keyboard
+            response[:4000],
+            reply_markup=keyboard,
+            disable_web_page_preview=True
         )
         await callback.answer()
         
     except Exception as e:
-        logger.error(f"Error showing contents: {e}")
-        await callback.message.edit_text("❌ Не удалось загрузить материалы.")
-        await callback.answer()
+        logger.error(f"Error showing module contents: {e}")
+        await callback.answer("❌ Не удалось загрузить модуль", show_alert=True)
 
 @dp.callback_query(F.data.startswith("favorite_"))
 async def toggle_favorite(callback: CallbackQuery):
     """Добавить/удалить из избранного"""
     user_id = callback.from_user.id
     
-    if user_id not in user_sessions:
+    if not await sessions.exists(user_id):
         await callback.answer("Сначала войдите в систему", show_alert=True)
         return
     
     course_id = int(callback.data.split("_")[1])
     
-    # Простая реализация избранного (без API)
-    if 'favorites' not in user_sessions[user_id]:
-        user_sessions[user_id]['favorites'] = []
+    # Простая реализация избранного (без API), хранится в сессии
+    added = await sessions.toggle_favorite(user_id, course_id)
     
-    favorites = user_sessions[user_id]['favorites']
-    
-    if course_id in favorites:
-        favorites.remove(course_id)
-        await callback.answer("💔 Удалено из избранного", show_alert=True)
-    else:
-        favorites.append(course_id)
+    if added:
         await callback.answer("❤️ Добавлено в избранное", show_alert=True)
+    else:
+        await callback.answer("💔 Удалено из избранного", show_alert=True)
     
     # Обновляем сообщение
     await show_course_detail(callback)
@@ -671,7 +829,7 @@ async def toggle_favorite(callback: CallbackQuery):
 async def back_to_menu(callback: CallbackQuery):
     """Вернуться в главное меню"""
     user_id = callback.from_user.id
-    is_auth = user_id in user_sessions
+    is_auth = await sessions.exists(user_id)
     
     await callback.message.edit_text(
         "🏠 *Главное меню*\n\nВыберите раздел:",
@@ -685,37 +843,14 @@ async def back_to_courses(callback: CallbackQuery):
     """Вернуться к списку курсов"""
     user_id = callback.from_user.id
     
-    if user_id not in user_sessions:
-        await callback.answer("Ошибка", show_alert=True)
-        return
-    
-    # Можно сохранять тип просмотра (все/мои/избранное)
-    # и возвращаться к соответствующему списку
-    await all_courses_cmd(callback.message)
-    await callback.answer()
-
-# ========== ЗАПУСК БОТА ==========
-
-async def main():
-    """Основная функция запуска"""
-    logger.info("=" * 50)
-    logger.info("🤖 Educa Telegram Bot запускается...")
-    logger.info(f"🌐 API URL: {config.API_BASE_URL}")
-    logger.info("=" * 50)
-    
+    # Возвращаемся на ту страницу каталога, которую пользователь смотрел
+    view = await sessions.get_view(user_id)
+    page = view["current_page"] if view and view["view_type"] == "all" else 1
     try:
-        me = await bot.get_me()
-        logger.info(f"✅ Бот: @{me.username} ({me.first_name})")
-        logger.info("✅ Готов к работе!")
-        
-        await dp.start_polling(bot, skip_updates=True)
-        
+        await show_catalog_page(callback, page)
     except Exception as e:
-        logger.error(f"❌ Ошибка: {e}", exc_info=True)
-        raise
-
-if __name__ == '__main__':
-    asyncio.run(main())
+        logger.error(f"Error returning to courses: {e}")
+        await callback.answer("❌ Не удалось загрузить курсы", show_alert=True)
 
 # ========== ПРОФИЛЬ ==========
 
@@ -724,7 +859,8 @@ async def profile_cmd(message: Message):
     """Профиль пользователя"""
     user_id = message.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await message.answer(
             "Для просмотра профиля необходимо авторизоваться.\n\n"
             "Нажмите '🔐 Войти'",
@@ -732,12 +868,20 @@ async def profile_cmd(message: Message):
         )
         return
     
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await message.answer("👤 Загружаю ваш профиль...")
     
     try:
-        profile = await api_client.get_user_profile(auth)
+        home = await api_client.get_home(auth)
+        if home is not None:
+            profile = {
+                'user': home['user'],
+                'statistics': home['statistics'],
+                'enrolled_courses': home['courses'],
+            }
+        else:
+            profile = await api_client.get_user_profile(auth)
         
         if not profile:
             await message.answer("❌ Не удалось загрузить профиль.")
@@ -778,7 +922,8 @@ async def progress_cmd(message: Message):
     """Прогресс пользователя"""
     user_id = message.from_user.id
     
-    if user_id not in user_sessions:
+    session = await sessions.get(user_id)
+    if not session:
         await message.answer(
             "Для просмотра прогресса необходимо авторизоваться.\n\n"
             "Нажмите '🔐 Войти'",
@@ -786,14 +931,26 @@ async def progress_cmd(message: Message):
         )
         return
     
-    auth = user_sessions[user_id]["auth"]
+    auth = session["auth"]
     
     await message.answer("📊 Загружаю ваш прогресс...")
     
     try:
-        progress_data = await api_client.get_all_progress(auth)
+        home = await api_client.get_home(auth)
+        if home is not None:
+            progress_data = {'courses': [
+                {
+                    'course_title': course['title'],
+                    'progress_percentage': course['progress'],
+                    'total_modules': course['total_modules'],
+                    'completed_modules_count': course['completed_modules'],
+                }
+                for course in home['courses']
+            ]}
+        else:
+            progress_data = await api_client.get_all_progress(auth)
         
-        if not progress_data or 'courses' not in progress_data:
+        if not progress_data or not progress_data.get('courses'):
             await message.answer(
                 "📭 У вас пока нет прогресса по курсам.\n\n"
                 "Начните изучать курсы чтобы отслеживать прогресс."
@@ -849,7 +1006,7 @@ async def guest_courses_cmd(message: Message):
         response += "*Примеры курсов:*\n"
         for i, course in enumerate(courses[:3], 1):
             title = course.get('title', 'Без названия')
-            overview = course.get('overview', '')[:60]
+            overview = course.get('overview_excerpt', '')[:60]
             response += f"{i}. *{title}*\n   {overview}...\n\n"
         
         response += "🔐 *Для полного доступа:* /login"
@@ -858,4 +1015,88 @@ async def guest_courses_cmd(message: Message):
         
     except Exception as e:
         logger.error(f"Error in guest_courses_cmd: {e}")
-        await message.answer("❌ Не удалось загрузить курсы для гостей.")
\ No newline at end of file
+        await message.answer("❌ Не удалось загрузить курсы для гостей.")
+
+# ========== ЗАПУСК БОТА ==========
+
+async def run_polling_mode():
+    """Long polling: опрашивает только процесс-лидер"""
+    lease = LeaderLease(
+        redis,
+        config.LEADER_KEY,
+        ttl=config.LEADER_TTL,
+        renew_interval=config.LEADER_RENEW_INTERVAL,
+    )
+    
+    async def start_polling():
+        me = await bot.get_me()
+        logger.info(f"✅ Бот: @{me.username} ({me.first_name})")
+        logger.info("✅ Готов к работе!")
+        # Сессию бота закрываем сами: после потери лидерства она ещё понадобится.
+        # Задачи на каждое обновление не нужны - их разбирает scheduler
+        await dp.start_polling(
+            bot, skip_updates=True, close_bot_session=False, handle_as_tasks=False
+        )
+    
+    # /metrics отдаёт каждый процесс, в том числе резервный
+    runner = web.AppRunner(create_metrics_app(metrics))
+    await runner.setup()
+    await web.TCPSite(runner, config.WEBHOOK_HOST, config.METRICS_PORT).start()
+    
+    logger.info("⏳ Ожидаю лидерства для опроса Telegram...")
+    try:
+        await run_as_leader(
+            lease,
+            start_polling,
+            dp.stop_polling,
+            retry_interval=config.LEADER_RETRY_INTERVAL,
+        )
+    finally:
+        await runner.cleanup()
+
+async def run_webhook_mode():
+    """Webhook: процессов может быть несколько, лидер не нужен"""
+    app = create_webhook_app(
+        dp,
+        bot,
+        scheduler,
+        path=config.WEBHOOK_PATH,
+        secret=config.WEBHOOK_SECRET,
+        webhook_url=config.WEBHOOK_URL or None,
+        record_path=config.WEBHOOK_RECORD_PATH or None,
+        metrics=metrics,
+    )
+    await run_webhook(app, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+
+async def main():
+    """Основная функция запуска"""
+    logger.info("=" * 50)
+    logger.info("🤖 Educa Telegram Bot запускается...")
+    logger.info(f"🌐 API URL: {config.API_BASE_URL} (транспорт: {config.API_TRANSPORT})")
+    logger.info(f"📡 Режим: {config.MODE}")
+    logger.info("=" * 50)
+    
+    if config.MODE == 'webhook' and not config.WEBHOOK_SECRET:
+        logger.error("❌ TELEGRAM_BOT_WEBHOOK_SECRET не задан!")
+        sys.exit(1)
+    
+    try:
+        if config.MODE == 'webhook':
+            await run_webhook_mode()
+        else:
+            await run_polling_mode()
+    except Exception as e:
+        logger.error(f"❌ Ошибка: {e}", exc_info=True)
+        raise
+    finally:
+        await scheduler.close()
+        await catalog.close()
+        logger.info(f"📊 Обновления: {scheduler.stats()}")
+        if api_client.cache:
+            logger.info(f"📊 Кэш API: {api_client.cache_stats()}")
+        await api_client.close()
+        await bot.session.close()
+        await redis.aclose()
+
+if __name__ == '__main__':
+    asyncio.run(main())
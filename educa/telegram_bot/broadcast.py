@@ -0,0 +1,307 @@
+"""
+Рассылки бота (анонсы новых модулей, напоминания о курсах).
+
+Очередь рассылки живёт в Redis:
+
+* ``educa:bot:broadcast:{id}`` - хэш с текстом, статусом и счётчиками;
+* ``...:queue`` - список ещё не обработанных чатов;
+* ``...:inflight`` - чаты, которые сейчас отправляются. Если процесс упал,
+  при следующем запуске они возвращаются в очередь, так что рассылку
+  можно продолжить командой ``resume``.
+
+Скорость ограничивают два token bucket: общий (Telegram допускает около
+30 сообщений в секунду на бота) и по чату (не чаще раза в секунду).
+Ответ 429 с ``retry_after`` приостанавливает всю рассылку на указанное
+время, чат возвращается в начало очереди.
+
+    python -m telegram_bot.broadcast start --text "Новый модуль!" [--usernames a,b]
+    python -m telegram_bot.broadcast resume <id>
+    python -m telegram_bot.broadcast status <id>
+"""
+import argparse
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import suppress
+from typing import Callable, Dict, List, Optional
+
+from aiogram.exceptions import (
+    TelegramAPIError, TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramRetryAfter, TelegramServerError, TelegramUnauthorizedError,
+)
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_KEY = 'educa:bot:broadcast:{}'
+# Сколько раз повторять отправку при сетевых ошибках и 5xx
+MAX_ATTEMPTS = 3
+# Хэши завершённых рассылок храним неделю
+FINISHED_TTL = 7 * 24 * 3600
+
+
+class TokenBucket:
+    """rate токенов в секунду, не больше burst подряд; pause() - стоп для всех"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ChatLimiter:
+    """Не чаще одного сообщения в interval секунд в один чат"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._next = {}
+
+    async def acquire(self, chat_id: int):
+        now = time.monotonic()
+        allowed = max(now, self._next.get(chat_id, 0.0))
+        self._next[chat_id] = allowed + self.interval
+        if len(self._next) > 10000:
+            self._next = {chat: at for chat, at in self._next.items() if at > now}
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+
+
+class Broadcast:
+    """Одна рассылка: состояние в Redis и отправка с учётом лимитов."""
+
+    def __init__(self, redis, broadcast_id: str):
+        self.redis = redis
+        self.id = broadcast_id
+        self.key = BROADCAST_KEY.format(broadcast_id)
+        self.queue_key = f'{self.key}:queue'
+        self.inflight_key = f'{self.key}:inflight'
+        self.attempts_key = f'{self.key}:attempts'
+        self.lock_key = f'{self.key}:lock'
+
+    @classmethod
+    async def create(cls, redis, text: str, chat_ids: List[int],
+                     parse_mode: Optional[str] = None) -> 'Broadcast':
+        broadcast = cls(redis, uuid.uuid4().hex[:12])
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(broadcast.key, mapping={
+                'text': text,
+                'parse_mode': parse_mode or '',
+                'status': 'pending',
+                'total': len(chat_ids),
+                'sent': 0,
+                'failed': 0,
+                'blocked': 0,
+                'created': int(time.time()),
+            })
+            if chat_ids:
+                pipe.rpush(broadcast.queue_key, *chat_ids)
+            await pipe.execute()
+        return broadcast
+
+    async def status(self) -> Dict:
+        fields, queued, inflight = await asyncio.gather(
+            self.redis.hgetall(self.key),
+            self.redis.llen(self.queue_key),
+            self.redis.llen(self.inflight_key),
+        )
+        status = {
+            (name.decode() if isinstance(name, bytes) else name):
+            (value.decode() if isinstance(value, bytes) else value)
+            for name, value in fields.items()
+        }
+        status.pop('text', None)
+        status['queued'] = queued
+        status['inflight'] = inflight
+        return status
+
+    async def _finish(self, chat_id: int, outcome: Optional[str]):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.inflight_key, 1, chat_id)
+            pipe.hdel(self.attempts_key, chat_id)
+            if outcome:
+                pipe.hincrby(self.key, outcome, 1)
+            await pipe.execute()
+
+    async def _requeue(self, chat_id: int):
+        """Вернуть чат в начало очереди (после 429 или сетевой ошибки)"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.inflight_key, 1, chat_id)
+            pipe.lpush(self.queue_key, chat_id)
+            await pipe.execute()
+
+    async def run(self, bot, global_bucket: TokenBucket, chat_limiter: ChatLimiter,
+                  concurrency: int = 4, on_blocked: Optional[Callable] = None,
+                  progress: Optional[Callable] = None, progress_interval: float = 5.0) -> Dict:
+        """
+        Отправить всё, что осталось в очереди. Один процесс на рассылку:
+        если её уже отправляет кто-то другой, выходим сразу.
+        """
+        if not await self.redis.set(self.lock_key, 1, nx=True, ex=60):
+            raise RuntimeError(f'Broadcast {self.id} is already running')
+
+        fields = await self.redis.hmget(self.key, 'text', 'parse_mode')
+        if fields[0] is None:
+            await self.redis.delete(self.lock_key)
+            raise RuntimeError(f'Broadcast {self.id} not found')
+        text, parse_mode = (value.decode() for value in fields)
+
+        # Чаты, оставшиеся "в полёте" после падения, отправляем заново
+        while await self.redis.lmove(self.inflight_key, self.queue_key, 'RIGHT', 'LEFT'):
+            pass
+        await self.redis.hset(self.key, 'status', 'running')
+
+        async def keep_lock():
+            while True:
+                await asyncio.sleep(20)
+                await self.redis.expire(self.lock_key, 60)
+
+        async def report():
+            while True:
+                await asyncio.sleep(progress_interval)
+                progress(await self.status())
+
+        async def worker():
+            while True:
+                raw = await self.redis.lmove(self.queue_key, self.inflight_key, 'LEFT', 'RIGHT')
+                if raw is None:
+                    return
+                chat_id = int(raw)
+                await global_bucket.acquire()
+                await chat_limiter.acquire(chat_id)
+                try:
+                    await bot.send_message(chat_id, text, parse_mode=parse_mode or None)
+                except TelegramRetryAfter as e:
+                    logger.warning(f"⚠️ Flood limit, пауза {e.retry_after} сек")
+                    global_bucket.pause(e.retry_after)
+                    await self._requeue(chat_id)
+                except TelegramForbiddenError:
+                    # Пользователь заблокировал бота
+                    await self._finish(chat_id, 'blocked')
+                    if on_blocked:
+                        await on_blocked(chat_id)
+                except TelegramBadRequest as e:
+                    logger.error(f"❌ Рассылка {self.id}, чат {chat_id}: {e}")
+                    await self._finish(chat_id, 'failed')
+                except (TelegramNetworkError, TelegramServerError) as e:
+                    attempts = await self.redis.hincrby(self.attempts_key, chat_id, 1)
+                    if attempts >= MAX_ATTEMPTS:
+                        logger.error(f"❌ Рассылка {self.id}, чат {chat_id}: {e}")
+                        await self._finish(chat_id, 'failed')
+                    else:
+                        await asyncio.sleep(attempts)
+                        await self._requeue(chat_id)
+                except TelegramUnauthorizedError:
+                    # Токен бота недействителен - остальные чаты тоже не получат
+                    await self._requeue(chat_id)
+                    raise
+                except TelegramAPIError as e:
+                    # Чат не найден, переехал в супергруппу и т.п.
+                    logger.error(f"❌ Рассылка {self.id}, чат {chat_id}: {e}")
+                    await self._finish(chat_id, 'failed')
+                else:
+                    await self._finish(chat_id, 'sent')
+
+        helpers = [asyncio.create_task(keep_lock())]
+        if progress:
+            helpers.append(asyncio.create_task(report()))
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                # Остановить остальных до снятия блокировки: чаты, которые они
+                # не успели отправить, останутся в inflight до resume
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                with suppress(Exception):
+                    await self.redis.hset(self.key, 'status', 'interrupted')
+                raise
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self.key, 'status', 'finished')
+                pipe.expire(self.key, FINISHED_TTL)
+                await pipe.execute()
+        finally:
+            for task in helpers:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+            await self.redis.delete(self.lock_key)
+        return await self.status()
+
+
+async def main(options):
+    import redis.asyncio as aioredis
+
+    from telegram_bot.config import config, create_bot
+    from telegram_bot.sessions import SessionStore, make_cipher
+
+    redis = aioredis.from_url(config.REDIS_URL)
+    sessions = SessionStore(
+        redis, make_cipher(config.SESSION_SECRET or config.TELEGRAM_TOKEN), ttl=config.SESSION_TTL
+    )
+    try:
+        if options.command == 'status':
+            print(await Broadcast(redis, options.id).status())
+            return
+
+        if options.command == 'start':
+            usernames = options.usernames.split(',') if options.usernames else None
+            chat_ids = await sessions.chat_ids(usernames)
+            broadcast = await Broadcast.create(redis, options.text, chat_ids, options.parse_mode)
+            print(f'Broadcast {broadcast.id}: {len(chat_ids)} chats')
+        else:
+            broadcast = Broadcast(redis, options.id)
+
+        bot = create_bot()
+        try:
+            result = await broadcast.run(
+                bot,
+                TokenBucket(config.BROADCAST_RATE),
+                ChatLimiter(config.BROADCAST_CHAT_INTERVAL),
+                concurrency=options.concurrency,
+                on_blocked=sessions.forget_chat,
+                progress=lambda status: print(
+                    f"sent={status['sent']} failed={status['failed']} "
+                    f"blocked={status['blocked']} queued={status['queued']}/{status['total']}"
+                ),
+            )
+        finally:
+            await bot.session.close()
+        print(result)
+    finally:
+        await redis.aclose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Рассылка сообщения пользователям бота')
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help='создать рассылку и отправить')
+    start.add_argument('--text', required=True)
+    start.add_argument('--parse-mode', default=None)
+    start.add_argument('--usernames', default='', help='только этим пользователям (через запятую)')
+    start.add_argument('--concurrency', type=int, default=4)
+    resume = commands.add_parser('resume', help='продолжить прерванную рассылку')
+    resume.add_argument('id')
+    resume.add_argument('--concurrency', type=int, default=4)
+    commands.add_parser('status', help='состояние рассылки').add_argument('id')
+    asyncio.run(main(parser.parse_args()))
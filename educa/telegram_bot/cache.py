@@ -0,0 +1,127 @@
+"""
+Кэш GET-ответов Educa API в процессе бота.
+
+* TTL задаётся по типу эндпоинта (CACHE_POLICIES), размер ограничен -
+  при переполнении вытесняется давно не использованная запись (LRU).
+* Ответы для гостей лежат в общем пространстве имён, ответы с учётными
+  данными - в пространстве пользователя (хэш логина и пароля), потому что
+  в них есть персональные поля (is_enrolled, прогресс).
+* Одновременные одинаковые GET сливаются в один запрос (single-flight).
+* Изменения через бота (запись на курс, прогресс) сбрасывают кэш
+  пользователя.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+PUBLIC_NAMESPACE = 'public'
+
+# (шаблон эндпоинта, TTL в секундах); без совпадения ответ не кэшируется
+CACHE_POLICIES = [
+    (re.compile(r'^courses/\d+/contents/$'), 300),
+    (re.compile(r'^courses/\d+/modules/\d+/contents/$'), 300),
+    (re.compile(r'^courses/my-courses/'), 30),
+    (re.compile(r'^courses/\d+/progress/$'), 30),
+    (re.compile(r'^courses/\d+/$'), 60),
+    (re.compile(r'^courses/(\?.*)?$'), 60),
+    (re.compile(r'^progress/$'), 30),
+    (re.compile(r'^user/profile/$'), 30),
+    (re.compile(r'^bot/home/$'), 30),
+]
+
+
+def cache_ttl(endpoint: str) -> Optional[float]:
+    endpoint = endpoint.lstrip('/')
+    for pattern, ttl in CACHE_POLICIES:
+        if pattern.match(endpoint):
+            return ttl
+    return None
+
+
+def namespace_for(auth: Optional[Tuple[str, str]]) -> str:
+    if not auth:
+        return PUBLIC_NAMESPACE
+    username, password = auth
+    return hashlib.sha256(f"{username}:{password}".encode()).hexdigest()[:32]
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (namespace, endpoint) -> (expires_at, value)
+        self._inflight = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    async def fetch(self, namespace: str, endpoint: str, ttl: float,
+                    load: Callable[[], Awaitable[Any]],
+                    cacheable: Callable[[Any], bool]) -> Any:
+        """Значение из кэша, из уже идущего запроса или из ``load()``."""
+        key = (namespace, endpoint)
+        value = self.get(key)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(inflight)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await load()
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже получил вызывающий; ожидающих может не быть
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if cacheable(value):
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, namespace: str):
+        """Сбросить все ответы пространства имён (после изменений)."""
+        keys = [key for key in self._entries if key[0] == namespace]
+        for key in keys:
+            del self._entries[key]
+        self.stats['invalidations'] += 1
+
+    def report(self) -> dict:
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['entries'] = len(self._entries)
+        stats['hit_ratio'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,83 @@
+"""
+Постраничный каталог курсов в боте.
+
+Страница бота - это страница API (``courses/?page=N&page_size=...``), число
+страниц считается по ``count`` из ответа. Готовые текст и клавиатура
+страницы кэшируются: персональных полей в них нет, поэтому кэш общий для
+всех пользователей. Пока пользователь читает страницу N, в фоне
+загружается N+1, и листание вперёд не ждёт API. Если пользователь нажал
+"Вперёд" раньше, чем закончилась предзагрузка, он ждёт тот же запрос
+(single-flight ResponseCache), а не делает второй.
+"""
+import asyncio
+import logging
+import math
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from telegram_bot.cache import ResponseCache, cache_ttl
+from telegram_bot.metrics import current_handler
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'catalog'
+
+
+class CatalogPage(NamedTuple):
+    text: str
+    keyboard: Any
+    total_pages: int
+
+
+class CatalogPages:
+    def __init__(self, api_client, render: Callable[[list, int, int], Tuple[str, Any]],
+                 page_size: int, max_entries: int = 200):
+        self.api_client = api_client
+        self.render = render
+        self.page_size = page_size
+        self.cache = ResponseCache(max_entries)
+        # Не дольше, чем живёт сам ответ API в кэше клиента
+        self.ttl = cache_ttl('courses/') or 60
+        self._tasks = set()
+        self.counters = {'prefetched': 0, 'prefetch_errors': 0}
+
+    async def _load(self, auth, page: int) -> Optional[CatalogPage]:
+        data = await self.api_client.get_courses_page(auth, page, self.page_size)
+        if data is None:
+            return None
+        total_pages = max(1, math.ceil(data.get('count', 0) / self.page_size))
+        text, keyboard = self.render(data.get('results', []), page, total_pages)
+        return CatalogPage(text, keyboard, total_pages)
+
+    async def get(self, auth, page: int) -> Optional[CatalogPage]:
+        """Страница каталога; None - страницы нет или API недоступен"""
+        return await self.cache.fetch(
+            NAMESPACE, str(page), self.ttl,
+            lambda: self._load(auth, page),
+            cacheable=lambda result: result is not None,
+        )
+
+    def prefetch(self, auth, page: int, total_pages: int):
+        """Загрузить страницу в фоне, если её ещё нет в кэше"""
+        if page < 1 or page > total_pages or self.cache.get((NAMESPACE, str(page))) is not None:
+            return
+        task = asyncio.create_task(self._prefetch(auth, page))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _prefetch(self, auth, page: int):
+        # Время фоновой загрузки не относится к хэндлеру, который её запустил
+        current_handler.set(None)
+        try:
+            if await self.get(auth, page) is not None:
+                self.counters['prefetched'] += 1
+        except Exception as e:
+            self.counters['prefetch_errors'] += 1
+            logger.error(f"❌ Предзагрузка страницы {page} каталога: {e}")
+
+    def report(self) -> Dict:
+        return {**self.cache.report(), **self.counters, 'prefetching': len(self._tasks)}
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
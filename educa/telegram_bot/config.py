@@ -13,8 +13,94 @@ class Config:
     def SITE_URL(self):
         return os.getenv('SITE_URL', 'https://ethically-polished-brill.cloudpub.ru')
     
+    @property
+    def API_TRANSPORT(self):
+        # 'inprocess' - вызывать сервисы Django напрямую, без HTTP
+        # (нужен DJANGO_SETTINGS_MODULE и зависимости веб-приложения)
+        return os.getenv('BOT_API_TRANSPORT', 'http')
+    
+    @property
+    def REDIS_URL(self):
+        return os.getenv('REDIS_URL', 'redis://cache:6379')
+    
+    # Выбор лидера: аренда в Redis и интервалы продления/повторного захвата (сек)
+    LEADER_KEY = 'educa:telegram_bot:leader'
+    LEADER_TTL = float(os.getenv('BOT_LEADER_TTL', '10'))
+    LEADER_RENEW_INTERVAL = float(os.getenv('BOT_LEADER_RENEW_INTERVAL', '3'))
+    LEADER_RETRY_INTERVAL = float(os.getenv('BOT_LEADER_RETRY_INTERVAL', '2'))
+    
+    @property
+    def TELEGRAM_API_URL(self):
+        # Другой Bot API сервер, например fake_telegram для нагрузочных тестов
+        return os.getenv('TELEGRAM_API_URL', '')
+    
+    @property
+    def MODE(self):
+        # 'polling' (с выбором лидера) или 'webhook'
+        return os.getenv('BOT_MODE', 'polling')
+    
+    @property
+    def WEBHOOK_URL(self):
+        return os.getenv('TELEGRAM_BOT_WEBHOOK_URL', '')
+    
+    @property
+    def WEBHOOK_SECRET(self):
+        return os.getenv('TELEGRAM_BOT_WEBHOOK_SECRET', '')
+    
+    @property
+    def WEBHOOK_RECORD_PATH(self):
+        # Записывать входящие обновления в JSONL для fake_telegram
+        return os.getenv('BOT_WEBHOOK_RECORD', '')
+    
+    WEBHOOK_PATH = os.getenv('BOT_WEBHOOK_PATH', '/telegram/webhook/')
+    WEBHOOK_HOST = os.getenv('BOT_WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('BOT_WEBHOOK_PORT', '8081'))
+    
+    # Обработка обновлений: хэндлеров одновременно (по разным пользователям),
+    # таймаут хэндлера (сек), лимиты очередей всего и на пользователя
+    UPDATE_CONCURRENCY = int(os.getenv('BOT_UPDATE_CONCURRENCY', '32'))
+    HANDLER_TIMEOUT = float(os.getenv('BOT_HANDLER_TIMEOUT', '30'))
+    MAX_PENDING_UPDATES = int(os.getenv('BOT_MAX_PENDING_UPDATES', '1000'))
+    MAX_USER_UPDATES = int(os.getenv('BOT_MAX_USER_UPDATES', '20'))
+    
+    @property
+    def SESSION_SECRET(self):
+        # Ключ Fernet (или любая строка) для шифрования паролей в сессиях;
+        # у всех процессов бота он должен совпадать
+        return os.getenv('BOT_SESSION_KEY', '')
+    
+    # Сессии и состояния FSM в Redis: срок жизни без активности (сек)
+    SESSION_TTL = int(os.getenv('BOT_SESSION_TTL', str(30 * 24 * 3600)))
+    FSM_TTL = int(os.getenv('BOT_FSM_TTL', str(3600)))
+    
+    # Кэш ответов API в процессе бота (0 - выключен)
+    API_CACHE_SIZE = int(os.getenv('BOT_API_CACHE_SIZE', '2000'))
+    
+    # Метрики: порт /metrics в режиме polling (в webhook - порт webhook)
+    # и Telegram id пользователей, которым /status показывает подробности
+    METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '9101'))
+    ADMIN_IDS = {int(value) for value in os.getenv('BOT_ADMIN_IDS', '').split(',') if value.strip()}
+    
+    # Рассылки: сообщений в секунду на бота (Telegram допускает ~30)
+    # и минимальный интервал между сообщениями в один чат (сек)
+    BROADCAST_RATE = float(os.getenv('BOT_BROADCAST_RATE', '25'))
+    BROADCAST_CHAT_INTERVAL = float(os.getenv('BOT_BROADCAST_CHAT_INTERVAL', '1'))
+    
     # Параметры пагинации
     PAGE_SIZE = 5
     MAX_COURSES_PER_PAGE = 5
 
-config = Config()
\ No newline at end of file
+config = Config()
+
+def create_bot():
+    """Bot с сервером Bot API из TELEGRAM_API_URL (если задан)"""
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    
+    if config.TELEGRAM_API_URL:
+        return Bot(
+            token=config.TELEGRAM_TOKEN,
+            session=AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL)),
+        )
+    return Bot(token=config.TELEGRAM_TOKEN)
@@ -0,0 +1,253 @@
+"""
+Локальный fake Telegram Bot API для нагрузочных тестов webhook режима.
+
+Сервер отвечает на вызовы Bot API (sendMessage, editMessageText,
+answerCallbackQuery, setWebhook, ...) правдоподобными ответами и
+воспроизводит записанные обновления (JSONL, см. BOT_WEBHOOK_RECORD) на
+webhook бота. Считает время ответа webhook и время до первого вызова
+Bot API ботом в ответ на каждое обновление. С ``--flood-limits``
+отвечает 429 с retry_after, как настоящий Telegram при превышении лимитов
+(30 сообщений в секунду на бота, 1 в секунду в чат) - для проверки
+рассылок (telegram_bot.broadcast).
+
+    TELEGRAM_API_URL=http://localhost:8082 BOT_MODE=webhook \\
+    TELEGRAM_BOT_WEBHOOK_SECRET=s python -m telegram_bot.bot_runner
+
+    python -m telegram_bot.fake_telegram --secret s --users 50 --rate 200
+"""
+import argparse
+import asyncio
+import copy
+import itertools
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+import aiohttp
+from aiohttp import web
+
+DEFAULT_UPDATES = os.path.join(os.path.dirname(__file__), 'fixtures', 'updates.jsonl')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def load_updates(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def update_chat_id(update):
+    for kind in ('message', 'edited_message'):
+        if kind in update:
+            return update[kind]['chat']['id']
+    if 'callback_query' in update:
+        return update['callback_query']['from']['id']
+    return None
+
+
+def as_user(update, user_id):
+    """Копия обновления от имени другого пользователя (чат = пользователь)"""
+    update = copy.deepcopy(update)
+    for kind in ('message', 'edited_message', 'callback_query'):
+        payload = update.get(kind)
+        if not payload:
+            continue
+        payload['from']['id'] = user_id
+        message = payload.get('message', payload)
+        if 'chat' in message:
+            message['chat']['id'] = user_id
+    return update
+
+
+class FakeTelegram:
+    """Bot API, который запоминает вызовы и время ответа бота."""
+
+    GLOBAL_LIMIT = 30
+    CHAT_INTERVAL = 1.0
+
+    def __init__(self, flood_limits: bool = False):
+        self.flood_limits = flood_limits
+        self.recent = deque()  # время последних отправок (окно 1 сек)
+        self.last_in_chat = {}
+        self.flood_errors = 0
+        self.delivered = defaultdict(int)  # chat_id -> число сообщений
+        self.calls = defaultdict(int)
+        self.pending = defaultdict(deque)  # chat_id -> время отправки обновлений
+        self.latencies = []
+        self._message_ids = itertools.count(1)
+
+    def sent(self, chat_id):
+        self.pending[chat_id].append(time.perf_counter())
+
+    def answered(self, chat_id):
+        queue = self.pending.get(chat_id)
+        if queue:
+            self.latencies.append(time.perf_counter() - queue.popleft())
+
+    def flood_wait(self, chat_id):
+        """Сколько секунд ждать, если лимиты превышены, иначе 0"""
+        now = time.monotonic()
+        while self.recent and now - self.recent[0] >= 1:
+            self.recent.popleft()
+        if len(self.recent) >= self.GLOBAL_LIMIT:
+            return 1
+        last = self.last_in_chat.get(chat_id)
+        if last is not None and now - last < self.CHAT_INTERVAL:
+            return 1
+        self.recent.append(now)
+        self.last_in_chat[chat_id] = now
+        return 0
+
+    def message(self, chat_id, text):
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': text or '',
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls[method] += 1
+
+        chat_id = params.get('chat_id')
+        if chat_id is not None:
+            chat_id = int(chat_id)
+            self.answered(chat_id)
+
+        if method == 'sendMessage' and chat_id is not None:
+            if self.flood_limits:
+                retry_after = self.flood_wait(chat_id)
+                if retry_after:
+                    self.flood_errors += 1
+                    return web.json_response({
+                        'ok': False,
+                        'error_code': 429,
+                        'description': f'Too Many Requests: retry after {retry_after}',
+                        'parameters': {'retry_after': retry_after},
+                    }, status=429)
+            self.delivered[chat_id] += 1
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        elif method in ('sendMessage', 'editMessageText') and chat_id is not None:
+            result = self.message(chat_id, params.get('text'))
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+
+
+async def replay(fake, updates, webhook_url, secret, users, rate, duration, grace):
+    """Отправить обновления на webhook с заданной частотой; вернуть метрики"""
+    acks = []
+    statuses = defaultdict(int)
+    interval = 1 / rate
+    update_ids = itertools.count(1)
+    sent = 0
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret}
+
+    async def post(session, update):
+        started = time.perf_counter()
+        async with session.post(webhook_url, json=update, headers=headers) as response:
+            statuses[response.status] += 1
+            await response.read()
+        acks.append(time.perf_counter() - started)
+
+    async with aiohttp.ClientSession() as session:
+        tasks = []
+        started = time.perf_counter()
+        for i in itertools.count():
+            if time.perf_counter() - started >= duration:
+                break
+            # Пользователи идут по кругу, у каждого свой проход по записи
+            user_id = 100000 + i % users
+            update = as_user(updates[(i // users) % len(updates)], user_id)
+            update['update_id'] = next(update_ids)
+            fake.sent(update_chat_id(update))
+            tasks.append(asyncio.create_task(post(session, update)))
+            sent += 1
+            await asyncio.sleep(max(0, started + sent * interval - time.perf_counter()))
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        deadline = time.perf_counter() + grace
+        while any(fake.pending.values()) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+
+    return {
+        'sent': sent,
+        'statuses': dict(statuses),
+        'ack_p50': percentile(acks, 50) * 1000,
+        'ack_p99': percentile(acks, 99) * 1000,
+        'reply_p50': percentile(fake.latencies, 50) * 1000,
+        'reply_p99': percentile(fake.latencies, 99) * 1000,
+        'replied_per_sec': len(fake.latencies) / elapsed if elapsed else 0,
+        'unanswered': sum(len(queue) for queue in fake.pending.values()),
+        'api_calls': dict(fake.calls),
+    }
+
+
+async def main(options):
+    fake = FakeTelegram(flood_limits=options.flood_limits)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, options.host, options.port).start()
+    print(f"Fake Bot API: http://{options.host}:{options.port}")
+    try:
+        if options.serve_only:
+            try:
+                await asyncio.Event().wait()
+            finally:
+                print(f'api_calls: {dict(fake.calls)}')
+                print(f'delivered: {sum(fake.delivered.values())} to {len(fake.delivered)} chats')
+                print(f'flood_errors: {fake.flood_errors}')
+        result = await replay(
+            fake,
+            load_updates(options.updates),
+            options.webhook,
+            options.secret,
+            users=options.users,
+            rate=options.rate,
+            duration=options.duration,
+            grace=options.grace,
+        )
+    finally:
+        await runner.cleanup()
+    for name, value in result.items():
+        if isinstance(value, float):
+            value = f'{value:.1f}'
+        print(f'{name:>16}: {value}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--updates', default=DEFAULT_UPDATES, help='JSONL с записанными обновлениями')
+    parser.add_argument('--webhook', default='http://localhost:8081/telegram/webhook/')
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=100, help='обновлений в секунду')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--grace', type=float, default=5,
+                        help='сколько ждать ответов бота после отправки')
+    parser.add_argument('--serve-only', action='store_true',
+                        help='только Bot API, без воспроизведения')
+    parser.add_argument('--flood-limits', action='store_true',
+                        help='отвечать 429 при превышении лимитов Telegram')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,41 @@
+"""
+Параллельные запросы бота к API с ограничением конкурентности.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 8
+DEFAULT_TIMEOUT = 5.0
+
+
+async def fan_out(items: Iterable[Any], fetch: Callable[[Any], Awaitable[Any]],
+                  limit: int = DEFAULT_LIMIT,
+                  timeout: float = DEFAULT_TIMEOUT) -> List[Optional[Any]]:
+    """
+    Выполнить ``fetch(item)`` для всех элементов, не более ``limit`` сразу.
+
+    Результаты идут в порядке ``items``. Запрос, который упал или не уложился
+    в ``timeout`` секунд, даёт ``None`` - остальные результаты всё равно
+    возвращаются, чтобы обработчик мог показать то, что удалось загрузить.
+    """
+    items = list(items)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(fetch(item), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ fan_out: таймаут запроса для {item!r}")
+            except Exception as e:
+                logger.error(f"❌ fan_out: ошибка запроса для {item!r}: {e}")
+            return None
+
+    results = await asyncio.gather(*(run(item) for item in items))
+    failed = sum(result is None for result in results)
+    if failed:
+        logger.warning(f"⚠️ fan_out: {failed} из {len(items)} запросов без результата")
+    return results
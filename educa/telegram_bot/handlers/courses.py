@@ -61,7 +61,7 @@ async def my_courses(message: Message, state: FSMContext):
     text = "📚 *Ваши курсы:*\n\n"
     for i, course in enumerate(courses[:5], 1):
         text += f"{i}. *{course.get('title', 'Без названия')}*\n"
-        text += f"   📝 {course.get('overview', '')[:50]}...\n\n"
+        text += f"   📝 {course.get('overview_excerpt', '')[:50]}...\n\n"
     
     await message.answer(
         text,
@@ -97,7 +97,7 @@ async def all_courses(message: Message, state: FSMContext):
     for i, course in enumerate(courses[:5], 1):
         text += f"{i}. *{course.get('title', 'Без названия')}*\n"
         text += f"   👨‍🏫 {course.get('owner_name', 'Автор')}\n"
-        text += f"   📝 {course.get('overview', '')[:50]}...\n\n"
+        text += f"   📝 {course.get('overview_excerpt', '')[:50]}...\n\n"
     
     await message.answer(
         text,
@@ -137,7 +137,7 @@ async def show_course(callback: CallbackQuery, state: FSMContext):
 📘 *{course.get('title', 'Без названия')}*
 
 📝 *Описание:*
-{course.get('overview', 'Нет описания')}
+{course.get('overview_excerpt') or 'Нет описания'}
 
 👨‍🏫 *Автор:* {course.get('owner_name', 'Неизвестен')}
 📅 *Создан:* {course.get('created', '')[:10]}
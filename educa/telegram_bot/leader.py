@@ -0,0 +1,138 @@
+"""
+Выбор лидера для Telegram бота через Redis.
+
+Процессов бота может быть несколько, но getUpdates опрашивает только тот,
+кто держит аренду (ключ в Redis с TTL). Лидер продлевает аренду каждые
+несколько секунд; если он умер, ключ истекает, и один из резервных
+процессов забирает лидерство в пределах ttl + retry_interval.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import suppress
+
+logger = logging.getLogger(__name__)
+
+# Продлеваем и снимаем аренду только если она всё ещё наша
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """Аренда лидерства в Redis с продлением."""
+
+    def __init__(self, redis, key: str, ttl: float = 10.0, renew_interval: float = 3.0):
+        self.redis = redis
+        self.key = key
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renewed_at = 0.0
+
+    @property
+    def ttl_ms(self) -> int:
+        return int(self.ttl * 1000)
+
+    async def acquire(self) -> bool:
+        acquired = await self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms)
+        if acquired:
+            self._renewed_at = time.monotonic()
+        return bool(acquired)
+
+    async def renew(self) -> bool:
+        renewed = await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.token, self.ttl_ms)
+        if renewed:
+            self._renewed_at = time.monotonic()
+        return bool(renewed)
+
+    async def release(self):
+        try:
+            await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.token)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось освободить аренду {self.key}: {e}")
+
+    async def hold(self):
+        """Продлевает аренду; возвращается, как только лидерство потеряно."""
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                if not await self.renew():
+                    logger.warning(f"⚠️ Аренда {self.key} перехвачена другим процессом")
+                    return
+            except Exception as e:
+                # Redis недоступен: после истечения ttl другой процесс
+                # может стать лидером, поэтому дольше ждать нельзя
+                if time.monotonic() - self._renewed_at >= self.ttl - self.renew_interval:
+                    logger.error(f"❌ Аренда {self.key} истекла, Redis недоступен: {e}")
+                    return
+                logger.warning(f"⚠️ Ошибка продления аренды {self.key}: {e}")
+
+
+async def run_as_leader(lease: LeaderLease, start, stop, retry_interval: float = 2.0,
+                        stop_timeout: float = 10.0):
+    """
+    Запускает ``start()`` только пока процесс является лидером.
+
+    Если аренда потеряна, вызывается ``stop()`` (а если работа ещё не
+    запущена и остановить её нечем - задача отменяется), и процесс снова
+    становится резервным. Если ``start()`` упал с ошибкой, аренда
+    освобождается и процесс тоже возвращается в резерв. Если ``start()``
+    завершился сам (например, по SIGTERM), аренда освобождается и функция
+    возвращается.
+    """
+    while True:
+        try:
+            acquired = await lease.acquire()
+        except Exception as e:
+            logger.error(f"❌ Ошибка захвата аренды {lease.key}: {e}")
+            acquired = False
+
+        if not acquired:
+            await asyncio.sleep(retry_interval)
+            continue
+
+        logger.info(f"👑 Процесс {lease.token} стал лидером")
+        work = asyncio.create_task(start())
+        keeper = asyncio.create_task(lease.hold())
+        try:
+            await asyncio.wait({work, keeper}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            keeper.cancel()
+            with suppress(asyncio.CancelledError):
+                await keeper
+
+        if work.done():
+            await lease.release()
+            if work.cancelled() or work.exception() is None:
+                return None if work.cancelled() else work.result()
+            # Временная ошибка (сеть, Telegram): уступаем лидерство и ждём снова
+            logger.error(f"❌ Ошибка в работе лидера: {work.exception()}", exc_info=work.exception())
+            await asyncio.sleep(retry_interval)
+            continue
+
+        logger.warning("⚠️ Лидерство потеряно, останавливаю опрос")
+        try:
+            await stop()
+        except Exception as e:
+            # Например, опрос ещё не начался (идёт get_me) - останавливать нечего
+            logger.warning(f"⚠️ Не удалось остановить работу ({e}), отменяю её")
+            work.cancel()
+        done, _ = await asyncio.wait({work}, timeout=stop_timeout)
+        if not done:
+            logger.warning(f"⚠️ Работа не остановилась за {stop_timeout} сек, отменяю")
+            work.cancel()
+        await asyncio.gather(work, return_exceptions=True)
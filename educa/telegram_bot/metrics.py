@@ -0,0 +1,250 @@
+"""
+Метрики задержек бота.
+
+* HandlerMetricsMiddleware - внутренний middleware на message и
+  callback_query: время каждого хэндлера, ошибки и число выполняющихся
+  хэндлеров (in-flight). Внешний middleware на update имя хэндлера ещё не
+  знает, а после OrderedUpdatesMiddleware хэндлер вообще выполняется позже,
+  поэтому меряем на уровне событий.
+* EducaAPIClient.hooks и TelegramRequestMetrics (middleware сессии
+  aiogram) - время запросов к Educa API и к Telegram. Оба учитываются и
+  отдельно по эндпоинтам, и в разбивке по текущему хэндлеру, чтобы было
+  видно, куда уходит время.
+
+Данные выводит команда /status и отдаёт в текстовом формате Prometheus
+``/metrics`` (render_prometheus).
+"""
+import contextvars
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+# Границы корзин гистограмм, мс
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+current_handler = contextvars.ContextVar('current_handler', default=None)
+
+
+def endpoint_name(endpoint: str) -> str:
+    """courses/12/progress/?x=1 -> courses/{id}/progress/"""
+    return re.sub(r'/\d+(?=/|$)', '/{id}', endpoint.split('?')[0].lstrip('/'))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(BUCKETS, ms)] += 1
+        self.count += 1
+        self.total += ms
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class BotMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.handlers = defaultdict(Histogram)
+        self.handler_errors = defaultdict(int)
+        self.in_flight = defaultdict(int)
+        # Время внешних вызовов внутри хэндлеров: (хэндлер, 'api'|'telegram') -> мс
+        self.handler_breakdown = defaultdict(float)
+        self.api = defaultdict(Histogram)
+        self.api_errors = defaultdict(int)
+        self.telegram = defaultdict(Histogram)
+        self.telegram_errors = defaultdict(int)
+        # Дополнительные показатели: префикс -> функция, возвращающая dict чисел
+        self.collectors: Dict[str, Callable[[], Dict]] = {}
+
+    def observe_api(self, endpoint: str, method: str, ms: float, ok: bool):
+        name = f'{method} {endpoint_name(endpoint)}'
+        self.api[name].observe(ms)
+        if not ok:
+            self.api_errors[name] += 1
+        handler = current_handler.get()
+        if handler:
+            self.handler_breakdown[(handler, 'api')] += ms
+
+    def observe_telegram(self, method: str, ms: float, ok: bool):
+        self.telegram[method].observe(ms)
+        if not ok:
+            self.telegram_errors[method] += 1
+        handler = current_handler.get()
+        if handler:
+            self.handler_breakdown[(handler, 'telegram')] += ms
+
+    def handler_summary(self):
+        """Хэндлеры по убыванию p95: (имя, число, p50, p95, api мс, telegram мс, ошибки)"""
+        rows = []
+        for name, histogram in self.handlers.items():
+            count = histogram.count or 1
+            rows.append((
+                name,
+                histogram.count,
+                histogram.quantile(0.5),
+                histogram.quantile(0.95),
+                self.handler_breakdown[(name, 'api')] / count,
+                self.handler_breakdown[(name, 'telegram')] / count,
+                self.handler_errors[name],
+            ))
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def _labels(**labels) -> str:
+    return ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+
+
+def _histogram_lines(metric: str, histogram: Histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+        cumulative += count
+        yield f'{metric}_bucket{{{_labels(**labels, le=bound)}}} {cumulative}'
+    yield f'{metric}_sum{{{_labels(**labels)}}} {histogram.total:.3f}'
+    yield f'{metric}_count{{{_labels(**labels)}}} {histogram.count}'
+
+
+def render_prometheus(metrics: BotMetrics) -> str:
+    lines = [
+        '# TYPE educa_bot_uptime_seconds gauge',
+        f'educa_bot_uptime_seconds {time.time() - metrics.started:.0f}',
+        '# TYPE educa_bot_handler_ms histogram',
+    ]
+    for name, histogram in sorted(metrics.handlers.items()):
+        lines.extend(_histogram_lines('educa_bot_handler_ms', histogram, handler=name))
+    lines.append('# TYPE educa_bot_handler_errors_total counter')
+    lines.extend(
+        f'educa_bot_handler_errors_total{{{_labels(handler=name)}}} {count}'
+        for name, count in sorted(metrics.handler_errors.items())
+    )
+    lines.append('# TYPE educa_bot_handler_in_flight gauge')
+    lines.extend(
+        f'educa_bot_handler_in_flight{{{_labels(handler=name)}}} {count}'
+        for name, count in sorted(metrics.in_flight.items())
+    )
+    lines.append('# TYPE educa_bot_handler_external_ms_total counter')
+    lines.extend(
+        f'educa_bot_handler_external_ms_total{{{_labels(handler=name, target=target)}}} {ms:.3f}'
+        for (name, target), ms in sorted(metrics.handler_breakdown.items())
+    )
+    for kind, histograms, errors in (
+        ('api', metrics.api, metrics.api_errors),
+        ('telegram', metrics.telegram, metrics.telegram_errors),
+    ):
+        lines.append(f'# TYPE educa_bot_{kind}_ms histogram')
+        for name, histogram in sorted(histograms.items()):
+            lines.extend(_histogram_lines(f'educa_bot_{kind}_ms', histogram, call=name))
+        lines.append(f'# TYPE educa_bot_{kind}_errors_total counter')
+        lines.extend(
+            f'educa_bot_{kind}_errors_total{{{_labels(call=name)}}} {count}'
+            for name, count in sorted(errors.items())
+        )
+    for prefix, collect in metrics.collectors.items():
+        for name, value in collect().items():
+            if isinstance(value, (int, float)):
+                lines.append(f'educa_bot_{prefix}_{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        token = current_handler.set(name)
+        self.metrics.in_flight[name] += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except BaseException:
+            self.metrics.handler_errors[name] += 1
+            raise
+        finally:
+            self.metrics.handlers[name].observe((time.perf_counter() - started) * 1000)
+            self.metrics.in_flight[name] -= 1
+            current_handler.reset(token)
+
+
+class TelegramRequestMetrics(BaseRequestMiddleware):
+    """Время запросов к Bot API (bot.session.middleware(...))"""
+
+    def __init__(self, metrics: BotMetrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        name = getattr(method, '__api_method__', type(method).__name__)
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await make_request(bot, method)
+            ok = True
+            return response
+        finally:
+            self.metrics.observe_telegram(name, (time.perf_counter() - started) * 1000, ok)
+
+
+def create_metrics_app(metrics: BotMetrics):
+    """aiohttp приложение с одним GET /metrics (для polling режима)"""
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_view(metrics))
+    return app
+
+
+def metrics_view(metrics: BotMetrics):
+    from aiohttp import web
+
+    async def view(request):
+        return web.Response(text=render_prometheus(metrics), content_type='text/plain')
+    return view
+
+
+def status_text(metrics: BotMetrics, limit: Optional[int] = 10) -> str:
+    """Текст для /status (без разметки: в именах есть подчёркивания)"""
+    uptime = int(time.time() - metrics.started)
+    text = f"🤖 Статус бота\n\n⏱ Работает: {uptime // 3600} ч {uptime % 3600 // 60} мин\n"
+    for prefix, collect in metrics.collectors.items():
+        values = ', '.join(f'{name}={value}' for name, value in collect().items())
+        text += f"📊 {prefix}: {values}\n"
+    rows = metrics.handler_summary()[:limit]
+    if rows:
+        text += "\nХэндлеры (p50/p95 мс, API/Telegram мс в среднем):\n"
+        for name, count, p50, p95, api_ms, telegram_ms, errors in rows:
+            text += (
+                f"• {name} ×{count}: {p50:g}/{p95:g}, "
+                f"API {api_ms:.0f}, TG {telegram_ms:.0f}"
+            )
+            text += f", ❌ {errors}\n" if errors else "\n"
+    return text
@@ -0,0 +1,161 @@
+"""
+Обработка обновлений: по порядку для одного пользователя, параллельно
+для разных.
+
+OrderedUpdatesMiddleware (внешний middleware на dp.update) не вызывает
+хэндлер сразу, а ставит его в очередь пользователя в UpdateScheduler и
+возвращается - polling и webhook не ждут медленных запросов к API.
+У каждого пользователя своя очередь, которую разбирает одна задача,
+поэтому его обновления и состояние FSM обрабатываются строго по очереди.
+Одновременно выполняется не больше ``concurrency`` хэндлеров, каждый -
+с таймаутом.
+
+При переполнении очереди в режиме polling middleware ждёт свободного места
+(offset уже подтверждён, отброшенное обновление потерялось бы) и тем самым
+тормозит опрос; в режиме webhook обновление отклоняется, а webhook.py
+отвечает 503 и Telegram повторит доставку.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateScheduler:
+    def __init__(self, concurrency: int = 32, timeout: float = 30.0,
+                 max_pending: int = 1000, max_per_user: int = 20):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._queues: Dict[Hashable, deque] = {}
+        self._tasks = set()
+        self._freed = asyncio.Event()
+        self.pending = 0
+        self.running = 0
+        self.counters = {
+            'submitted': 0,
+            'processed': 0,
+            'failed': 0,
+            'timeouts': 0,
+            'dropped': 0,
+        }
+
+    def full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def accepts(self, key: Hashable) -> bool:
+        queue = self._queues.get(key)
+        return not self.full() and (queue is None or len(queue) < self.max_per_user)
+
+    async def wait_capacity(self, key: Hashable):
+        """Дождаться, пока submit(key, ...) сможет принять обновление"""
+        while not self.accepts(key):
+            self._freed.clear()
+            await self._freed.wait()
+
+    def submit(self, key: Hashable, job: Callable[[], Awaitable[Any]]) -> bool:
+        """Поставить job в очередь пользователя key; False - очередь переполнена"""
+        queue = self._queues.get(key)
+        if not self.accepts(key):
+            # Общий лимит или пользователь жмёт кнопки быстрее, чем мы отвечаем
+            self.counters['dropped'] += 1
+            return False
+        if queue is None:
+            queue = self._queues[key] = deque()
+            task = asyncio.create_task(self._drain(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append(job)
+        self.pending += 1
+        self.counters['submitted'] += 1
+        return True
+
+    async def _drain(self, key, queue: deque):
+        try:
+            while queue:
+                job = queue[0]
+                async with self._semaphore:
+                    self.running += 1
+                    try:
+                        await asyncio.wait_for(job(), self.timeout)
+                    except asyncio.TimeoutError:
+                        self.counters['timeouts'] += 1
+                        logger.error(f"❌ Хэндлер для {key} не уложился в {self.timeout} сек")
+                    except Exception as e:
+                        self.counters['failed'] += 1
+                        logger.error(f"❌ Ошибка обработки обновления {key}: {e}", exc_info=True)
+                    else:
+                        self.counters['processed'] += 1
+                    finally:
+                        self.running -= 1
+                queue.popleft()
+                self.pending -= 1
+                self._freed.set()
+        finally:
+            if self._queues.get(key) is queue:
+                del self._queues[key]
+            # Отменённая задача оставляет необработанные обновления
+            self.pending -= len(queue)
+            self._freed.set()
+
+    def stats(self) -> Dict:
+        depths = [len(queue) for queue in self._queues.values()]
+        return {
+            **self.counters,
+            'pending': self.pending,
+            'running': self.running,
+            'active_users': len(depths),
+            'max_user_depth': max(depths, default=0),
+        }
+
+    async def close(self, timeout: float = 10.0):
+        """Дождаться очередей (не дольше timeout), остальное отменить"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class OrderedUpdatesMiddleware(BaseMiddleware):
+    """
+    Передаёт обработку обновления в UpdateScheduler по id пользователя.
+
+    С ``wait_capacity`` (polling) ждёт места в очереди. Без него (webhook)
+    отклонённое планировщиком обновление логируется, а нажатие кнопки
+    получает ответ - иначе у пользователя крутится индикатор загрузки.
+    """
+    BUSY_TEXT = "⏳ Слишком много запросов, попробуйте чуть позже"
+
+    def __init__(self, scheduler: UpdateScheduler, wait_capacity: bool = False):
+        self.scheduler = scheduler
+        self.wait_capacity = wait_capacity
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        key = user.id if user else chat.id if chat else ('update', event.update_id)
+        if self.wait_capacity:
+            await self.scheduler.wait_capacity(key)
+        if self.scheduler.submit(key, lambda: handler(event, data)):
+            return
+        logger.warning(f"⚠️ Обновление {event.update_id} для {key} отклонено: очередь переполнена")
+        if event.callback_query:
+            try:
+                await event.callback_query.answer(self.BUSY_TEXT)
+            except Exception as e:
+                logger.error(f"❌ Не удалось ответить на callback {event.update_id}: {e}")
@@ -0,0 +1,155 @@
+"""
+Сессии пользователей бота в Redis.
+
+Сессия - один хэш ``educa:bot:session:{telegram_id}`` с короткими полями
+(u - логин, p - пароль, f - избранное через запятую), состояние просмотра
+списка курсов - хэш ``educa:bot:view:{telegram_id}``, все чаты, писавшие
+боту, - множество ``educa:bot:chats`` (для рассылок). У ключей сессии
+скользящий TTL: каждое обращение продлевает срок, заброшенные сессии
+Redis удаляет сам. Пароль хранится только зашифрованным (Fernet), поэтому
+сессии переживают перезапуск и доступны всем процессам бота.
+"""
+import base64
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'educa:bot:session:{}'
+VIEW_KEY = 'educa:bot:view:{}'
+CHATS_KEY = 'educa:bot:chats'
+
+
+def make_cipher(secret: str) -> Fernet:
+    """
+    Fernet из BOT_SESSION_KEY. Ключ Fernet подходит как есть, любую другую
+    строку (например, токен бота) превращаем в ключ через SHA-256.
+    """
+    try:
+        return Fernet(secret)
+    except (ValueError, TypeError):
+        return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()))
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class SessionStore:
+    def __init__(self, redis, cipher: Fernet, ttl: int):
+        self.redis = redis
+        self.cipher = cipher
+        self.ttl = ttl
+
+    async def get(self, user_id: int) -> Optional[Dict]:
+        """Сессия {"username", "auth", "favorites"} или None"""
+        key = SESSION_KEY.format(user_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(key)
+            pipe.expire(key, self.ttl)
+            fields, _ = await pipe.execute()
+        if not fields:
+            return None
+        fields = {_decode(name): _decode(value) for name, value in fields.items()}
+        try:
+            password = self.cipher.decrypt(fields['p'].encode()).decode()
+        except (InvalidToken, KeyError):
+            # Ключ шифрования сменили - просим войти заново
+            logger.warning(f"⚠️ Не удалось расшифровать сессию {user_id}, удаляю")
+            await self.delete(user_id)
+            return None
+        username = fields['u']
+        return {
+            "username": username,
+            "auth": (username, password),
+            "favorites": [int(course_id) for course_id in fields.get('f', '').split(',') if course_id],
+        }
+
+    async def exists(self, user_id: int) -> bool:
+        return bool(await self.redis.exists(SESSION_KEY.format(user_id)))
+
+    async def create(self, user_id: int, username: str, password: str):
+        key = SESSION_KEY.format(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={
+                'u': username,
+                'p': self.cipher.encrypt(password.encode()).decode(),
+                'f': '',
+            })
+            pipe.expire(key, self.ttl)
+            pipe.sadd(CHATS_KEY, user_id)
+            await pipe.execute()
+
+    async def delete(self, user_id: int):
+        await self.redis.delete(SESSION_KEY.format(user_id), VIEW_KEY.format(user_id))
+
+    async def toggle_favorite(self, user_id: int, course_id: int) -> Optional[bool]:
+        """True - курс добавлен, False - удалён, None - сессии нет"""
+        key = SESSION_KEY.format(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    if not await pipe.exists(key):
+                        return None
+                    raw = _decode(await pipe.hget(key, 'f') or b'')
+                    favorites: List[int] = [int(value) for value in raw.split(',') if value]
+                    added = course_id not in favorites
+                    if added:
+                        favorites.append(course_id)
+                    else:
+                        favorites.remove(course_id)
+                    pipe.multi()
+                    pipe.hset(key, 'f', ','.join(str(value) for value in favorites))
+                    pipe.expire(key, self.ttl)
+                    await pipe.execute()
+                    return added
+                except WatchError:
+                    # Сессию изменил другой процесс - пробуем ещё раз
+                    continue
+
+    async def set_view(self, user_id: int, view_type: str, page: int, total_pages: int):
+        """Какой список курсов и какую страницу пользователь смотрит"""
+        key = VIEW_KEY.format(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={'v': view_type, 'p': page, 't': total_pages})
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def get_view(self, user_id: int) -> Optional[Dict]:
+        fields = await self.redis.hgetall(VIEW_KEY.format(user_id))
+        if not fields:
+            return None
+        fields = {_decode(name): _decode(value) for name, value in fields.items()}
+        return {
+            "view_type": fields['v'],
+            "current_page": int(fields['p']),
+            "total_pages": int(fields['t']),
+        }
+
+    async def remember_chat(self, chat_id: int):
+        await self.redis.sadd(CHATS_KEY, chat_id)
+
+    async def forget_chat(self, chat_id: int):
+        """Пользователь заблокировал бота - больше ему не пишем"""
+        await self.redis.srem(CHATS_KEY, chat_id)
+
+    async def chat_ids(self, usernames: Optional[List[str]] = None) -> List[int]:
+        """Все известные чаты или только чаты с сессиями этих пользователей"""
+        chat_ids = sorted([int(chat_id) async for chat_id in self.redis.sscan_iter(CHATS_KEY, count=1000)])
+        if usernames is None:
+            return chat_ids
+        wanted = set(usernames)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for chat_id in chat_ids:
+                pipe.hget(SESSION_KEY.format(chat_id), 'u')
+            owners = await pipe.execute()
+        return [
+            chat_id for chat_id, owner in zip(chat_ids, owners)
+            if owner is not None and _decode(owner) in wanted
+        ]
@@ -0,0 +1,457 @@
+"""
+Транспорты EducaAPIClient.
+
+HTTPTransport ходит в REST API Educa по сети. InProcessTransport вызывает
+те же сервисные функции (courses.services) и сериализаторы прямо в
+процессе бота - без HTTP, nginx и uWSGI. Оба возвращают одинаковые
+структуры: данные ответа или ``{"error": ..., "status_code": ...}``.
+"""
+import base64
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+from aiohttp import ClientTimeout
+
+logger = logging.getLogger(__name__)
+
+# Таймауты по типу запроса (сек): проверка логина должна отвечать быстро,
+# записи (enroll, progress) могут ждать дольше чтения
+ENDPOINT_TIMEOUTS = {
+    'auth': ClientTimeout(total=5, connect=3),
+    'read': ClientTimeout(total=10, connect=3),
+    'write': ClientTimeout(total=15, connect=3),
+}
+
+
+class HTTPTransport:
+    """
+    HTTP транспорт с одной долгоживущей сессией.
+
+    Соединения (TCP + TLS) переиспользуются через keep-alive пул
+    TCPConnector, DNS кэшируется. Сессия создаётся при первом запросе
+    и закрывается через close() при остановке бота.
+    """
+    def __init__(self, base_url: str, limit: int = 100, limit_per_host: int = 20,
+                 keepalive_timeout: float = 60, dns_ttl: int = 300):
+        self.base_url = base_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.metrics = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Считает новые и переиспользованные соединения пула."""
+        trace_config = aiohttp.TraceConfig()
+
+        def counter(name):
+            async def handler(session, context, params):
+                self.metrics[name] += 1
+            return handler
+
+        trace_config.on_request_start.append(counter('requests'))
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace_config
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_ttl,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=ENDPOINT_TIMEOUTS['read'],
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        logger.info(f"HTTP transport closed, connection stats: {self.connection_stats()}")
+
+    def connection_stats(self) -> Dict:
+        """Метрики пула: доля запросов без нового TCP/TLS соединения"""
+        stats = dict(self.metrics)
+        requests = stats['requests']
+        stats['reuse_ratio'] = round(stats['connections_reused'] / requests, 3) if requests else 0.0
+        return stats
+
+    @staticmethod
+    def _create_auth_headers(auth: Optional[Tuple[str, str]] = None) -> Dict:
+        """Создает заголовки с Basic Auth"""
+        headers = {
+            'User-Agent': 'TelegramBot/1.0',
+            'Accept': 'application/json',
+        }
+
+        if auth and len(auth) == 2:
+            username, password = auth
+            credentials = f"{username}:{password}"
+            encoded = base64.b64encode(credentials.encode()).decode()
+            headers['Authorization'] = f'Basic {encoded}'
+
+        return headers
+
+    async def request(self, endpoint: str, method: str = "GET",
+                      auth: Optional[Tuple[str, str]] = None,
+                      timeout: Optional[str] = None, **kwargs) -> Any:
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        headers = self._create_auth_headers(auth)
+        timeout = ENDPOINT_TIMEOUTS[timeout or ('read' if method == "GET" else 'write')]
+
+        # Обновляем заголовки из kwargs
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+
+        try:
+            session = await self._get_session()
+            async with session.request(
+                method=method,
+                url=url,
+                headers=headers,
+                timeout=timeout,
+                **kwargs
+            ) as response:
+
+                logger.info(f"API Request: {method} {url} -> {response.status}")
+
+                if response.status in (200, 201):
+                    return await response.json()
+                try:
+                    error_data = await response.json()
+                    return {"error": error_data, "status_code": response.status}
+                except Exception:
+                    error_text = await response.text()
+                    return {"error": f"HTTP {response.status}: {error_text[:200]}",
+                            "status_code": response.status}
+
+        except Exception as e:
+            logger.error(f"API Error: {e}")
+            return {"error": str(e), "status_code": 0}
+
+
+class InProcessTransport:
+    """
+    Транспорт без сети: маршрутизирует пути REST API на courses.services.
+
+    Требует настроенный Django (DJANGO_SETTINGS_MODULE) в процессе бота.
+    Проверенные логин/пароль кэшируются на AUTH_CACHE_TTL секунд, чтобы не
+    считать хэш пароля на каждое нажатие кнопки (в HTTP режиме это делает
+    BasicAuthentication на каждый запрос). Ключ - HMAC на SECRET_KEY, запись
+    действует, пока хэш пароля в БД не изменился; хранится не больше
+    AUTH_CACHE_SIZE записей (LRU).
+    """
+    AUTH_CACHE_TTL = 300
+    AUTH_CACHE_SIZE = 1000
+    AUTH_CACHE_SALT = 'telegram_bot.transports.InProcessTransport.auth'
+
+    ROUTES = [
+        ('GET', r'courses/', '_course_list'),
+        ('GET', r'courses/my-courses/', '_my_courses'),
+        ('GET', r'courses/(?P<course_id>\d+)/', '_course_detail'),
+        ('GET', r'courses/(?P<course_id>\d+)/contents/', '_course_contents'),
+        ('GET', r'courses/(?P<course_id>\d+)/modules/(?P<module_id>\d+)/contents/', '_module_contents'),
+        ('POST', r'courses/(?P<course_id>\d+)/enroll/', '_enroll'),
+        ('GET', r'courses/(?P<course_id>\d+)/progress/', '_course_progress'),
+        ('POST', r'courses/(?P<course_id>\d+)/progress/', '_update_progress'),
+        ('GET', r'progress/', '_all_progress'),
+        ('GET', r'user/profile/', '_user_profile'),
+        ('GET', r'bot/home/', '_bot_home'),
+        ('POST', r'auth/verify/', '_auth_verify'),
+    ]
+
+    def __init__(self):
+        import django
+        from django.apps import apps
+
+        if not apps.ready:
+            django.setup()
+        self._routes = [
+            (method, re.compile(f'^{pattern}$'), getattr(self, handler))
+            for method, pattern, handler in self.ROUTES
+        ]
+        self._auth_cache = OrderedDict()  # hmac -> (user_id, password hash, expires_at)
+        self._auth_lock = threading.Lock()
+
+    async def close(self):
+        pass
+
+    async def request(self, endpoint: str, method: str = "GET",
+                      auth: Optional[Tuple[str, str]] = None,
+                      timeout: Optional[str] = None, json=None, **kwargs) -> Any:
+        from asgiref.sync import sync_to_async
+
+        try:
+            # thread_sensitive=False: запросы разных пользователей не ждут
+            # друг друга в одном потоке
+            return await sync_to_async(self._dispatch, thread_sensitive=False)(
+                endpoint, method, auth, json or {}
+            )
+        except Exception as e:
+            logger.error(f"In-process API error: {method} {endpoint}: {e}")
+            return {"error": str(e), "status_code": 500}
+
+    def _dispatch(self, endpoint, method, auth, data):
+        from django.db import close_old_connections
+
+        close_old_connections()
+        try:
+            parts = urlsplit(endpoint.lstrip('/'))
+            params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            for route_method, pattern, handler in self._routes:
+                match = pattern.match(parts.path)
+                if match and route_method == method:
+                    if handler == self._auth_verify and auth:
+                        throttled = self._throttle_auth_verify(auth[0])
+                        if throttled:
+                            return throttled
+                    user = self._authenticate(auth)
+                    if user is False:
+                        return self._error(401, "Invalid username/password.")
+                    logger.info(f"In-process API: {method} {endpoint}")
+                    return handler(user, params, data, **match.groupdict())
+            return self._error(404, "Not found.")
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _throttle_auth_verify(username):
+        """Лимит попыток входа на логин - общий с AuthVerifyThrottle HTTP API."""
+        from courses.api.throttles import AuthVerifyThrottle
+
+        throttle = AuthVerifyThrottle()
+        if throttle.allow_username(username):
+            return None
+        wait = math.ceil(throttle.wait() or 0)
+        return InProcessTransport._error(
+            429, f"Request was throttled. Expected available in {wait} seconds."
+        )
+
+    @staticmethod
+    def _error(status_code, detail):
+        return {"error": {"detail": detail}, "status_code": status_code}
+
+    def _authenticate(self, auth):
+        """User, None (аноним) или False (неверные учётные данные)."""
+        from django.contrib.auth.models import User
+        from django.utils.crypto import constant_time_compare, salted_hmac
+        from courses import services
+
+        if not auth:
+            return None
+        username, password = auth
+        cache_key = salted_hmac(self.AUTH_CACHE_SALT, f'{username}\0{password}').hexdigest()
+        with self._auth_lock:
+            cached = self._auth_cache.get(cache_key)
+            if cached:
+                self._auth_cache.move_to_end(cache_key)
+        if cached and cached[2] > time.monotonic():
+            user = User.objects.filter(pk=cached[0], is_active=True).first()
+            # После смены пароля старая пара больше не принимается
+            if user and constant_time_compare(user.password, cached[1]):
+                return user
+        user = services.verify_credentials(username, password)
+        with self._auth_lock:
+            if user is None:
+                self._auth_cache.pop(cache_key, None)
+                return False
+            self._auth_cache[cache_key] = (
+                user.pk, user.password, time.monotonic() + self.AUTH_CACHE_TTL
+            )
+            self._auth_cache.move_to_end(cache_key)
+            while len(self._auth_cache) > self.AUTH_CACHE_SIZE:
+                self._auth_cache.popitem(last=False)
+        return user
+
+    # ========== Обработчики ==========
+
+    @staticmethod
+    def _context(user):
+        from types import SimpleNamespace
+        from django.contrib.auth.models import AnonymousUser
+
+        # Сериализаторам нужен только request.user
+        return {'request': SimpleNamespace(user=user or AnonymousUser())}
+
+    def _paginate(self, user, queryset, params, endpoint):
+        from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+        from courses.api.pagination import StandartPagination
+        from courses.api.serializers import CourseListSerializer
+
+        page_size = StandartPagination.page_size
+        if params.get('page_size', '').isdigit():
+            page_size = min(int(params['page_size']), StandartPagination.max_page_size)
+        try:
+            page = Paginator(queryset, page_size).page(params.get('page', 1))
+        except (EmptyPage, PageNotAnInteger):
+            return self._error(404, "Invalid page.")
+        return {
+            'count': page.paginator.count,
+            'next': f"{endpoint}?page={page.next_page_number()}" if page.has_next() else None,
+            'previous': f"{endpoint}?page={page.previous_page_number()}" if page.has_previous() else None,
+            'results': CourseListSerializer(page, many=True, context=self._context(user)).data,
+        }
+
+    @staticmethod
+    def _courses():
+        from courses.models import Course
+        return Course.objects.prefetch_related("modules").prefetch_related("students")
+
+    def _get_course(self, course_id):
+        return self._courses().filter(id=course_id).first()
+
+    def _course_list(self, user, params, data):
+        from courses import services
+
+        courses = self._courses()
+        if params.get('ids'):
+            try:
+                courses = courses.filter(id__in=services.parse_ids(params['ids']))
+            except ValueError as e:
+                return {"error": {"ids": str(e)}, "status_code": 400}
+        return self._paginate(user, courses.defer('overview'), params, 'courses/')
+
+    def _my_courses(self, user, params, data):
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        return self._paginate(
+            user, self._courses().filter(students=user).defer('overview'), params,
+            'courses/my-courses/'
+        )
+
+    def _course_detail(self, user, params, data, course_id):
+        from courses.api.serializers import CourseSerializer
+
+        course = self._get_course(course_id)
+        if course is None:
+            return self._error(404, "No Course matches the given query.")
+        return CourseSerializer(course, context=self._context(user)).data
+
+    def _course_contents(self, user, params, data, course_id):
+        from courses import services
+        from courses.api.serializers import CourseWithContentsSerializer
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        course = self._get_course(course_id)
+        if course is None:
+            return self._error(404, "No Course matches the given query.")
+        if not services.is_enrolled(user, course):
+            return self._error(403, "You do not have permission to perform this action.")
+        return CourseWithContentsSerializer(course, context=self._context(user)).data
+
+    def _module_contents(self, user, params, data, course_id, module_id):
+        from courses import services
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        course = self._get_course(course_id)
+        if course is None:
+            return self._error(404, "No Course matches the given query.")
+        if not services.is_enrolled(user, course):
+            return self._error(403, "You do not have permission to perform this action.")
+        module = course.modules.filter(id=module_id).first()
+        if module is None:
+            return self._error(404, "No Module matches the given query.")
+        return services.module_contents(module)
+
+    def _enroll(self, user, params, data, course_id):
+        from courses import services
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        course = self._get_course(course_id)
+        if course is None:
+            return self._error(404, "No Course matches the given query.")
+        return services.enroll(user, course)
+
+    def _enrolled_course(self, user, course_id):
+        """(course, None) или (None, ошибка) - как проверки CourseProgressAPIView."""
+        from courses import services
+
+        if user is None:
+            return None, self._error(401, "Authentication credentials were not provided.")
+        course = self._get_course(course_id)
+        if course is None:
+            return None, self._error(404, "No Course matches the given query.")
+        if not services.is_enrolled(user, course):
+            return None, {"error": {"error": "Not enrolled in this course"}, "status_code": 403}
+        return course, None
+
+    def _course_progress(self, user, params, data, course_id):
+        from courses import services
+
+        course, error = self._enrolled_course(user, course_id)
+        if error:
+            return error
+        return services.course_progress(user, course)
+
+    def _update_progress(self, user, params, data, course_id):
+        from courses import services
+
+        course, error = self._enrolled_course(user, course_id)
+        if error:
+            return error
+        module_id = data.get('module_id')
+        if not module_id:
+            return {"error": {"error": "module_id is required"}, "status_code": 400}
+        if not course.modules.filter(id=module_id).exists():
+            return {"error": {"error": "Module not found"}, "status_code": 404}
+        return services.update_progress(user, course, module_id, data.get('completed', False))
+
+    def _all_progress(self, user, params, data):
+        from courses import services
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        return services.all_progress(user)
+
+    def _user_profile(self, user, params, data):
+        from courses import services
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        return services.user_profile(user)
+
+    def _bot_home(self, user, params, data):
+        from courses import services
+
+        if user is None:
+            return self._error(401, "Authentication credentials were not provided.")
+        return services.bot_home(user)
+
+    def _auth_verify(self, user, params, data):
+        from courses import services
+
+        if user is None:
+            return self._error(400, "Authentication credentials were not provided.")
+        return services.auth_verify(user)
+
+
+def create_transport(kind: str, base_url: str):
+    """Транспорт по имени из настроек бота: 'http' или 'inprocess'."""
+    if kind == 'inprocess':
+        return InProcessTransport()
+    return HTTPTransport(base_url)
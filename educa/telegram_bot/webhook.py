@@ -0,0 +1,108 @@
+"""
+Приём обновлений Telegram через webhook (aiohttp).
+
+Обработчик только проверяет секрет (заголовок
+X-Telegram-Bot-Api-Secret-Token), передаёт обновление диспетчеру и сразу
+отвечает 200: OrderedUpdatesMiddleware только ставит хэндлер в очередь
+пользователя (telegram_bot.scheduler), так что Telegram не ждёт, пока
+отработают хэндлеры. Если очередей накопилось слишком много, отвечаем
+503, и Telegram повторит доставку позже.
+
+Состояние бота (FSM, сессии) лежит в Redis, поэтому процессов с webhook
+может быть несколько - за балансировщиком, без выбора лидера.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import signal
+from contextlib import suppress
+from typing import Optional
+
+from aiohttp import web
+
+from telegram_bot.metrics import metrics_view
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def create_webhook_app(dp, bot, scheduler, path: str, secret: str,
+                       webhook_url: Optional[str] = None,
+                       record_path: Optional[str] = None,
+                       metrics=None) -> web.Application:
+    """
+    aiohttp приложение с webhook по адресу ``path`` (и ``/metrics``, если
+    переданы метрики бота).
+
+    Если задан ``webhook_url``, при старте он регистрируется в Telegram.
+    ``record_path`` - файл, куда дописываются входящие обновления (JSONL)
+    для последующего воспроизведения fake_telegram.
+    """
+    record = open(record_path, 'a', encoding='utf-8') if record_path else None
+
+    async def handle(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), secret):
+            return web.Response(status=403)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if record:
+            record.write(json.dumps(update, ensure_ascii=False) + '\n')
+        if scheduler.full():
+            logger.warning("⚠️ Очередь обновлений переполнена, Telegram повторит доставку")
+            return web.Response(status=503)
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            # Повторная доставка того же обновления не поможет
+            logger.error(f"❌ Ошибка разбора update {update.get('update_id')}: {e}", exc_info=True)
+        return web.Response()
+
+    async def on_startup(app):
+        await dp.emit_startup(bot=bot, dispatcher=dp)
+        if webhook_url:
+            await bot.set_webhook(
+                webhook_url,
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            logger.info(f"✅ Webhook: {webhook_url}")
+
+    async def on_shutdown(app):
+        # Webhook не удаляем: его могут обслуживать другие процессы
+        await scheduler.close()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        if record:
+            record.close()
+
+    app = web.Application()
+    app['scheduler'] = scheduler
+    app.router.add_post(path, handle)
+    if metrics is not None:
+        app.router.add_get('/metrics', metrics_view(metrics))
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+async def run_webhook(app: web.Application, host: str, port: int):
+    """Запустить приложение и работать до SIGTERM/SIGINT"""
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stopped.set)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"✅ Webhook слушает {host}:{port}")
+    try:
+        await stopped.wait()
+        logger.info("🛑 Останавливаю webhook...")
+    finally:
+        await runner.cleanup()
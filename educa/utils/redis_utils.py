@@ -1,11 +1,22 @@
 """
 Redis utilities for tracking student progress.
 """
+import asyncio
+import atexit
 import redis
+import redis.asyncio as aioredis
 import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+LAST_MODULE_TTL = 86400
+
 # Простое подключение
 try:
     redis_client = redis.Redis(
@@ -21,6 +32,241 @@ except Exception as e:
     redis_client = None
 
 
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """Async Redis client bound to the running event loop (Daphne, bot)."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=5
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def last_module_key(user_id, course_id):
+    return f"educa:user:{user_id}:course:{course_id}:last_module"
+
+
+def progress_group(user_id):
+    """Группа Channels со всеми открытыми вкладками/устройствами пользователя."""
+    return f"progress_{user_id}"
+
+
+def bot_home_key(user_id):
+    return f"educa:bot_home:{user_id}"
+
+
+def invalidate_bot_home(user_ids):
+    """Drop the cached /api/bot/home/ payloads of these users."""
+    if not user_ids:
+        return
+    try:
+        from django.core.cache import cache
+        cache.delete_many([bot_home_key(user_id) for user_id in set(user_ids)])
+    except Exception as e:
+        logger.error(f"❌ invalidate_bot_home error: {e}")
+
+
+class ProgressPublisher:
+    """
+    Sends progress deltas to the channel layer from its own event loop thread.
+
+    Callers (request handlers, the last-module flush timer) only enqueue:
+    no async_to_sync on the request path, and publishing also works when the
+    caller already runs inside an event loop.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                try:
+                    threading.Thread(
+                        target=loop.run_forever, name='progress-publisher', daemon=True
+                    ).start()
+                except RuntimeError as e:
+                    loop.close()
+                    logger.error(f"❌ progress publisher thread failed to start: {e}")
+                    return None
+                self._loop = loop
+            return self._loop
+
+    def submit(self, deltas):
+        loop = self._get_loop()
+        if loop is None:
+            logger.error(f"❌ publish_progress: no event loop, dropped {len(deltas)} deltas")
+            return
+        future = asyncio.run_coroutine_threadsafe(self._send(deltas), loop)
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    async def _send(deltas):
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            logger.error(f"❌ publish_progress: no channel layer, dropped {len(deltas)} deltas")
+            return
+        for user_id, delta in deltas:
+            await channel_layer.group_send(
+                progress_group(user_id),
+                {'type': 'progress_delta', 'delta': delta},
+            )
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception():
+            logger.error(f"❌ publish_progress error: {future.exception()}")
+
+
+progress_publisher = ProgressPublisher()
+
+
+def publish_progress(deltas):
+    """
+    Push compact progress deltas to the users' progress groups.
+
+    ``deltas`` is a list of ``(user_id, delta)``. Inside a transaction the
+    push (and dropping the users' cached bot home) waits for the commit;
+    the send itself runs on the publisher thread. Failures are logged,
+    never raised to the caller.
+    """
+    if not deltas:
+        return
+
+    def publish():
+        invalidate_bot_home([user_id for user_id, _ in deltas])
+        progress_publisher.submit(deltas)
+
+    from django.db import transaction
+    # Без транзакции (поток flush) on_commit открыл бы лишнее соединение с БД
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(publish)
+    else:
+        publish()
+
+
+class LastModuleWriteBuffer:
+    """
+    Coalesces last-module writes per (user, course) over a short window.
+
+    Navigating through several modules within the window produces a single
+    write of the final value, and re-visiting the module that was already
+    written recently costs one read (the value in Redis is checked, since
+    other processes may have changed it) instead of a write. Pending values are flushed in one
+    pipeline by a timer thread (or inline by the next touch if the timer
+    could not run).
+    """
+    def __init__(self, window=2.0, dedupe_seconds=30, max_entries=10000):
+        self.window = window
+        self.dedupe_seconds = dedupe_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._written = OrderedDict()
+        self._deadline = None
+        self._timer = None
+
+    def touch(self, user_id, course_id, module_id):
+        key = (int(user_id), int(course_id))
+        module_id = int(module_id)
+        now = time.monotonic()
+        flush_now = False
+        with self._lock:
+            written = self._written.get(key)
+            recent = written and written[0] == module_id and now - written[1] < self.dedupe_seconds
+        # Другой процесс (бот, API) мог записать другой модуль после нас:
+        # пропускаем запись, только если в Redis то же значение
+        if recent and self._stored(key) == module_id:
+            with self._lock:
+                self._pending.pop(key, None)
+            return
+        with self._lock:
+            self._pending[key] = module_id
+            if self._deadline is None:
+                self._deadline = now + self.window
+                self._start_timer()
+            elif now >= self._deadline:
+                flush_now = True
+        if flush_now:
+            self.flush()
+
+    @staticmethod
+    def _stored(key):
+        try:
+            value = redis_client.get(last_module_key(*key))
+        except Exception as e:
+            logger.error(f"❌ last_module read error: {e}")
+            return None
+        return int(value) if value else None
+
+    def _start_timer(self):
+        try:
+            self._timer = threading.Timer(self.window, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+        except RuntimeError:
+            # Потоки недоступны - запись выполнит следующий touch()
+            self._timer = None
+
+    def pending(self, user_id, course_id):
+        with self._lock:
+            return self._pending.get((int(user_id), int(course_id)))
+
+    def mark_written(self, user_id, course_id, module_id):
+        key = (int(user_id), int(course_id))
+        with self._lock:
+            self._pending.pop(key, None)
+            self._remember(key, int(module_id), time.monotonic())
+
+    def _remember(self, key, module_id, now):
+        self._written[key] = (module_id, now)
+        self._written.move_to_end(key)
+        while len(self._written) > self.max_entries:
+            self._written.popitem(last=False)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._deadline = None
+            self._timer = None
+        if not pending or not redis_client:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for (user_id, course_id), module_id in pending.items():
+                pipe.set(last_module_key(user_id, course_id), module_id, ex=LAST_MODULE_TTL)
+            pipe.execute()
+            now = time.monotonic()
+            with self._lock:
+                for key, module_id in pending.items():
+                    self._remember(key, module_id, now)
+            logger.info(f"✅ Flushed {len(pending)} last_module writes")
+        except Exception as e:
+            logger.error(f"❌ last_module flush error: {e}")
+            return
+        publish_progress([
+            (user_id, {'type': 'progress', 'course': course_id, 'last_module': module_id})
+            for (user_id, course_id), module_id in pending.items()
+        ])
+
+
+last_module_buffer = LastModuleWriteBuffer(
+    window=getattr(settings, 'LAST_MODULE_WRITE_WINDOW', 2.0),
+    dedupe_seconds=getattr(settings, 'LAST_MODULE_DEDUPE_SECONDS', 30),
+)
+atexit.register(last_module_buffer.flush)
+
+
 class CourseProgressTracker:
     @staticmethod
     def set_last_module(user_id, course_id, module_id):
@@ -29,24 +275,43 @@ class CourseProgressTracker:
             return False
         
         try:
-            key = f"educa:user:{user_id}:course:{course_id}:last_module"
+            key = last_module_key(user_id, course_id)
             logger.info(f"🔑 Setting Redis key: {key} = {module_id}")
-            result = redis_client.set(key, module_id)
-            redis_client.expire(key, 86400)
+            result = redis_client.set(key, module_id, ex=LAST_MODULE_TTL)
+            last_module_buffer.mark_written(user_id, course_id, module_id)
             logger.info(f"✅ set_last_module result: {result}")
+            publish_progress([(user_id, {
+                'type': 'progress',
+                'course': int(course_id),
+                'last_module': int(module_id),
+            })])
             return True
         except Exception as e:
             logger.error(f"❌ set_last_module error: {e}")
             return False
     
+    @staticmethod
+    def touch_last_module(user_id, course_id, module_id):
+        """
+        Deferred, deduplicated variant of set_last_module for page views.
+        """
+        if not redis_client:
+            return False
+        last_module_buffer.touch(user_id, course_id, module_id)
+        return True
+    
     @staticmethod
     def get_last_module(user_id, course_id):
         if not redis_client:
             logger.error("❌ Redis client is None!")
             return None
         
+        pending = last_module_buffer.pending(user_id, course_id)
+        if pending is not None:
+            return pending
+        
         try:
-            key = f"educa:user:{user_id}:course:{course_id}:last_module"
+            key = last_module_key(user_id, course_id)
             val = redis_client.get(key)
             logger.info(f"🔍 get_last_module: {key} = {val}")
             return int(val) if val else None
@@ -63,13 +328,23 @@ class CourseProgressTracker:
         try:
             key = f"educa:user:{user_id}:course:{course_id}:completed"
             logger.info(f"🔑 mark_module_completed: {key}, module={module_id}, completed={completed}")
+            pipe = redis_client.pipeline(transaction=False)
             if completed:
-                result = redis_client.sadd(key, module_id)
-                logger.info(f"✅ sadd result: {result}")
+                pipe.sadd(key, module_id)
             else:
-                result = redis_client.srem(key, module_id)
-                logger.info(f"✅ srem result: {result}")
-            redis_client.expire(key, 86400)
+                pipe.srem(key, module_id)
+            pipe.expire(key, 86400)
+            pipe.scard(key)
+            result, _, completed_count = pipe.execute()
+            logger.info(f"✅ {'sadd' if completed else 'srem'} result: {result}")
+            if result:
+                publish_progress([(user_id, {
+                    'type': 'progress',
+                    'course': int(course_id),
+                    'module': int(module_id),
+                    'completed': completed,
+                    'completed_count': completed_count,
+                })])
             return True
         except Exception as e:
             logger.error(f"❌ mark_module_completed error: {e}")
@@ -105,6 +380,38 @@ class CourseProgressTracker:
             logger.error(f"❌ get_completed_modules error: {e}")
             return set()
     
+    @staticmethod
+    def get_progress_batch(user_id, course_ids):
+        """
+        {course_id: (completed module ids, last module id)} for several
+        courses in one pipelined round trip.
+        """
+        if not course_ids:
+            return {}
+        result = {course_id: (set(), None) for course_id in course_ids}
+        if not redis_client:
+            logger.error("❌ Redis client is None!")
+            return result
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for course_id in course_ids:
+                pipe.smembers(f"educa:user:{user_id}:course:{course_id}:completed")
+                pipe.get(last_module_key(user_id, course_id))
+            replies = pipe.execute()
+        except Exception as e:
+            logger.error(f"❌ get_progress_batch error: {e}")
+            return result
+        for index, course_id in enumerate(course_ids):
+            completed, last_module = replies[2 * index], replies[2 * index + 1]
+            pending = last_module_buffer.pending(user_id, course_id)
+            if pending is not None:
+                last_module = pending
+            result[course_id] = (
+                {int(m) for m in completed},
+                int(last_module) if last_module else None,
+            )
+        return result
+    
     @staticmethod
     def get_course_progress_percentage(user_id, course_id, total_modules):
         if total_modules == 0: